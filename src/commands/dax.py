@@ -1,16 +1,23 @@
+import sys
 from enum import StrEnum
 from pathlib import Path
 from uuid import UUID
 
 import typer
 from typing_extensions import Annotated
+from rich.console import Console
 
 from utils.azure_api import get_access_token
 from utils.powerbi_api import POWER_BI_SCOPE, execute_dax
-from utils.dax_utils import read_dax_query, load_dax_result_to_dataframe
+from utils.dax_utils import (
+    read_dax_query,
+    load_dax_rows_to_dataframe,
+    load_dax_result_to_table,
+)
 from utils.dataframe_utils import (
     save_dataframe_to_csv,
     save_dataframe_to_parquet,
+    save_table_to_parquet,
     print_dataframe,
 )
 
@@ -59,10 +66,11 @@ def dax_command(
         typer.Option(
             "--outputformat",
             "-f",
-            help="Formato del fichero de salida.",
+            help="Formato del fichero de salida. Si no se indica, se utiliza CSV si el fichero de salida tiene la extensión .csv y Parquet en cualquier otro caso.",
+            show_default=False,
             case_sensitive=False,
         ),
-    ] = OutputFileFormat.csv,
+    ] = None,
     print_dax_result: Annotated[
         bool,
         typer.Option(
@@ -76,10 +84,22 @@ def dax_command(
     dax_query = read_dax_query(file_dax)
     access_token = get_access_token(POWER_BI_SCOPE)
     r = execute_dax(access_token, data_set, dax_query)
-    df = load_dax_result_to_dataframe(r)
+
+    # Si Arrow puede leer el resultado, el fichero Parquet se guarda directamente desde la tabla de Arrow,
+    # sin crear un DataFrame de pandas que duplicaría la memoria utilizada.
+    # El fichero CSV se guarda siempre con pandas, para mantener su formato.
+    table = load_dax_result_to_table(r)
+    df = load_dax_rows_to_dataframe(r) if table is None else None
 
     if print_dax_result:
-        print_dataframe(df)
+        print_dataframe(df if df is not None else table.to_pandas())
+
+    # Si no se indica el formato, se deduce de la extensión del fichero de salida, igual que en el comando daxdif
+    if output_file_format is None:
+        if output_file_path is not None and output_file_path.suffix.lower() == ".csv":
+            output_file_format = OutputFileFormat.csv
+        else:
+            output_file_format = OutputFileFormat.parquet
 
     if output_file_path is None:
         # El nombre del fichero de salida por defecto es el nombre del fichero de la consulta y el nombre de dataset
@@ -89,7 +109,19 @@ def dax_command(
         elif output_file_format == OutputFileFormat.parquet:
             output_file_path = f"{default_output_file_name}.parquet"
 
-    if output_file_format == OutputFileFormat.csv:
-        save_dataframe_to_csv(df, output_file_path)
-    elif output_file_format == OutputFileFormat.parquet:
-        save_dataframe_to_parquet(df, output_file_path)
+    try:
+        if output_file_format == OutputFileFormat.csv:
+            save_dataframe_to_csv(
+                df if df is not None else table.to_pandas(), output_file_path
+            )
+        elif output_file_format == OutputFileFormat.parquet:
+            if table is not None:
+                save_table_to_parquet(table, output_file_path)
+            else:
+                save_dataframe_to_parquet(df, output_file_path)
+    except Exception as ex:
+        Console().print(
+            f"No se pudo guardar el resultado de la consulta DAX en el fichero {output_file_path}: {ex}",
+            style="red",
+        )
+        sys.exit(2)
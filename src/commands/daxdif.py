@@ -1,19 +1,27 @@
+from __future__ import annotations
+
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
 import sys
 
 import typer
-from typing import List
+from typing import List, TYPE_CHECKING
 from typing_extensions import Annotated
-import pandas as pd
-from pandas.core.groupby.generic import DataFrameGroupBy
 from rich.console import Console
-from rich.table import Table
 
 from utils.azure_api import get_access_token
 from utils.powerbi_api import POWER_BI_SCOPE, execute_dax
 from utils.dax_utils import read_dax_query, load_dax_result_to_dataframe
-from utils.dataframe_utils import save_dataframe_to_csv, print_dataframe
+from utils.dataframe_utils import (
+    save_dataframe_to_csv,
+    save_dataframe_to_parquet,
+    print_dataframe,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from rich.table import Table
 
 
 # Nombre de la columna del resultado donde se indicará el dataset de origen de la fila (d1, d2)
@@ -70,7 +78,7 @@ def daxdif_command(
         typer.Option(
             "--output1",
             "-o1",
-            help="Ruta a un fichero para guardar el resultado de la consulta DAX sobre el primero modelo semántico.",
+            help="Ruta a un fichero para guardar el resultado de la consulta DAX sobre el primero modelo semántico. Si la extensión es .csv se guarda en formato CSV, si no, en formato Parquet.",
             show_default=False,
             dir_okay=False,
             resolve_path=True,
@@ -81,7 +89,7 @@ def daxdif_command(
         typer.Option(
             "--output2",
             "-o2",
-            help="Ruta a un fichero para guardar el resultado de la consulta DAX sobre el segundo modelo semántico.",
+            help="Ruta a un fichero para guardar el resultado de la consulta DAX sobre el segundo modelo semántico. Si la extensión es .csv se guarda en formato CSV, si no, en formato Parquet.",
             show_default=False,
             dir_okay=False,
             resolve_path=True,
@@ -142,10 +150,10 @@ def daxdif_command(
     # Valores por defecto de los ficheros de salida
 
     if output_file1_path is None:
-        output_file1_path = f"{file_dax.stem}_{data_set1}.csv"
+        output_file1_path = f"{file_dax.stem}_{data_set1}.parquet"
 
     if output_file2_path is None:
-        output_file2_path = f"{file_dax.stem}_{data_set2}.csv"
+        output_file2_path = f"{file_dax.stem}_{data_set2}.parquet"
 
     if dif_file_path is None:
         dif_file_path = f"{file_dax.stem}_dif_{data_set1}_{data_set2}.csv"
@@ -155,15 +163,28 @@ def daxdif_command(
     dax_query = read_dax_query(file_dax)
     access_token = get_access_token(POWER_BI_SCOPE)
 
-    df1 = execute_dax_and_save(access_token, data_set1, dax_query, output_file1_path)
-    print(
-        f"Se ha ejecutado la consulta DAX sobre el primer modelo semántico y se ha guardado en el archivo: {output_file1_path}"
+    # Las consultas sobre ambos modelos son independientes, por lo que se ejecutan a la vez
+    executor = ThreadPoolExecutor(max_workers=2)
+    future1 = executor.submit(
+        execute_dax_to_dataframe, access_token, data_set1, dax_query
     )
-
-    df2 = execute_dax_and_save(access_token, data_set2, dax_query, output_file2_path)
-    print(
-        f"Se ha ejecutado la consulta DAX sobre el segundo modelo semántico y se ha guardado en el archivo: {output_file2_path}"
+    future2 = executor.submit(
+        execute_dax_to_dataframe, access_token, data_set2, dax_query
     )
+    df1 = future1.result()
+    df2 = future2.result()
+
+    # Los resultados de cada modelo se guardan en segundo plano mientras se hace la comparación
+    save_future1 = executor.submit(save_dax_result, df1, output_file1_path)
+    save_future2 = executor.submit(save_dax_result, df2, output_file2_path)
+    executor.shutdown(wait=False)
+
+    # Si la consulta no devuelve filas en un modelo, su DataFrame no tiene columnas.
+    # Se le dan las columnas y los tipos del otro resultado, para que todas las filas del otro se reporten como diferentes.
+    if df1.columns.empty:
+        df1 = df2.head(0)
+    elif df2.columns.empty:
+        df2 = df1.head(0)
 
     # Determinando cuales columnas serán parte de la clave
     key_columns = get_dataframe_key_columns(
@@ -178,18 +199,42 @@ def daxdif_command(
     print(f"Lugares decimales para la comparación: {decimal_places}")
     print(f"Tolerancia para la comparación: {tolerance}")
 
-    # Creando un DataFrame para hacer la conparación, donde estén concanedados los resultados ambos datasets
-    df1[COLUMN_NAME_SOURCE] = "d1"
-    df2[COLUMN_NAME_SOURCE] = "d2"
-    df_union = pd.concat([df1, df2], ignore_index=True)
-    df_union = df_union.round(decimal_places)
-
-    # Agrupando ambos resultados por las columnas claves.
-    # En cada grupo solo deben haber 2 filas, una por cada dataset.
-    grouped_df = df_union.groupby(key_columns)
+    # Solo se redondean las columnas numéricas que se van a comparar
+    # round devuelve un DataFrame nuevo, por lo que no se modifican df1 y df2 mientras se están guardando en segundo plano
+    round_columns = df1[compare_columns].select_dtypes(include="number").columns
+    df1 = df1.round({c: decimal_places for c in round_columns})
+    df2 = df2.round({c: decimal_places for c in round_columns})
+
+    # Para cada clave solo debe haber una fila por cada dataset.
+    # Si se encuentra alguna clave repetida en un mismo dataset, significa que la clave no es correcta porque produce más de una fila por dataset.
+    has_duplicated_keys = (
+        df1.duplicated(subset=key_columns).any()
+        or df2.duplicated(subset=key_columns).any()
+    )
 
-    # Si se encuentra algún grupo con más de 2 filas, significa que la clave no es correcta porque produce más de una fila por dataset.
-    if (grouped_df.count() > 2).any(axis=None):
+    if not has_duplicated_keys:
+        df_dif = compare_dataframes(df1, df2, key_columns, compare_columns, tolerance)
+
+    # Esperando a que terminen de guardarse los resultados de cada modelo.
+    # Si falla el guardado de alguno, se informa y se continúa, para que se guarde el archivo con las diferencias.
+    has_save_errors = False
+    for model_name, save_future, output_file_path in (
+        ("primer", save_future1, output_file1_path),
+        ("segundo", save_future2, output_file2_path),
+    ):
+        try:
+            save_future.result()
+            print(
+                f"Se ha ejecutado la consulta DAX sobre el {model_name} modelo semántico y se ha guardado en el archivo: {output_file_path}"
+            )
+        except Exception as ex:
+            has_save_errors = True
+            console.print(
+                f"No se pudo guardar el resultado de la consulta DAX sobre el {model_name} modelo semántico en el archivo {output_file_path}: {ex}",
+                style="red",
+            )
+
+    if has_duplicated_keys:
         console.print(
             "No se puede hacer la comparación porque el resultado de la consulta DAX tiene más de una fila para las columnas claves.",
             style="red",
@@ -199,8 +244,6 @@ def daxdif_command(
         )
         sys.exit(2)
 
-    df_dif = compare_grouped_dataframes(grouped_df, compare_columns, tolerance)
-
     # Si el DataFrame no está vacío indica que se encontraron diferencias
     if df_dif is not None:
         console.print(
@@ -214,23 +257,31 @@ def daxdif_command(
         if print_dif_result:
             print_dataframe(df_dif, add_dif_dataframe_rows_to_table)
 
-        sys.exit(1)
+        sys.exit(2 if has_save_errors else 1)
     else:  # No se encontraron diferencias
         console.print(
             "¡Muy bien! No se encontraron diferencias al ejecutar la consulta DAX entre los dos modelos semánticos.",
             style="green",
         )
 
+        if has_save_errors:
+            sys.exit(2)
+
 
-def execute_dax_and_save(
-    access_token: str, dataset_id: UUID, dax_query: str, output_file_path: str
+def execute_dax_to_dataframe(
+    access_token: str, dataset_id: UUID, dax_query: str
 ) -> pd.DataFrame:
-    """Ejecuta una consulta DAX contra un modelos semántico y guarda el resultado en un archivo CSV.
-    Retorna un DataFrame con el resultado."""
+    """Ejecuta una consulta DAX contra un modelo semántico y devuelve el resultado en un DataFrame Pandas."""
     r = execute_dax(access_token, dataset_id, dax_query)
-    df = load_dax_result_to_dataframe(r)
-    save_dataframe_to_csv(df, output_file_path)
-    return df
+    return load_dax_result_to_dataframe(r)
+
+
+def save_dax_result(df: pd.DataFrame, output_file_path: str) -> None:
+    """Guarda el resultado de una consulta DAX en un archivo CSV o Parquet, según la extensión del archivo."""
+    if Path(output_file_path).suffix.lower() == ".csv":
+        save_dataframe_to_csv(df, output_file_path)
+    else:
+        save_dataframe_to_parquet(df, output_file_path)
 
 
 def get_dataframe_key_columns(
@@ -239,51 +290,94 @@ def get_dataframe_key_columns(
     columns_exclude_key: List[str] = None,
 ) -> List[str]:
     """Decide cuales columnas de un DatFrame se van a utilizar como clave para identificar las filas."""
-    key_columns = []
-
-    for column_name, column_type in df.dtypes.items():
-        if column_name in columns_include_key:
-            key_columns.append(column_name)
-            continue
+    include = set(columns_include_key or [])
+    exclude = set(columns_exclude_key or [])
+    # Por defecto, las columnas de tipo texto
+    text_columns = set(df.select_dtypes(include=["object", "string"]).columns)
+
+    # Se recorre df.columns para mantener el orden original de las columnas
+    return [
+        c
+        for c in df.columns
+        if c in include or (c not in exclude and c in text_columns)
+    ]
+
+
+def compare_dataframes(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    key_columns: List[str],
+    compare_columns: List[str] = None,
+    tolerance: float = 0.01,
+) -> pd.DataFrame:
+    """Compara las filas de ambos datasets que tienen la misma clave.
+    En lugar de recorrer cada grupo, se alinean las filas de los dos datasets por la clave y se restan todas las columnas a la vez.
+    Retorna un DataFrame con las filas diferentes de ambos datasets o None si no hay diferencias.
+    """
+    import numpy as np
+    import pandas as pd
 
-        if column_name in columns_exclude_key:
-            continue
+    # Si la consulta no devuelve filas en ninguno de los dos modelos, no hay nada que comparar
+    if df1.empty and df2.empty:
+        return None
 
-        # la columna es de tipo texto
-        if str(column_type) == "object":
-            key_columns.append(column_name)
+    d1 = df1.set_index(key_columns)
+    d2 = df2.set_index(key_columns)
 
-    return key_columns
+    # Claves que están en ambos datasets
+    common_keys = d1.index.intersection(d2.index)
 
+    # Comparando los valores en las columnas numéricas de todas las filas a la vez.
+    values1 = (
+        d1[compare_columns]
+        .reindex(common_keys)
+        .to_numpy(dtype="float64", na_value=np.nan)
+    )
+    values2 = (
+        d2[compare_columns]
+        .reindex(common_keys)
+        .to_numpy(dtype="float64", na_value=np.nan)
+    )
+    # La resta y el valor absoluto se hacen sobre el mismo array para no reservar matrices intermedias,
+    # lo que se nota cuando la consulta devuelve muchas columnas numéricas.
+    np.subtract(values1, values2, out=values1)
+    np.abs(values1, out=values1)
+    dif_mask = values1 > tolerance
+    rows_with_dif = dif_mask.any(axis=1)
+
+    # Para cada clave con diferencias se guarda la lista de las columnas con valores diferentes.
+    compare_columns_array = np.array(compare_columns, dtype=object)
+    dif_by_key = pd.Series(
+        ["|".join(compare_columns_array[m]) for m in dif_mask[rows_with_dif]],
+        index=common_keys[rows_with_dif],
+        dtype=object,
+    )
 
-def compare_grouped_dataframes(
-    grouped_df: DataFrameGroupBy,
-    compare_columns: List[str] = None,
-    tolerance: float = 0.01,
-) -> pd.DataFrame:
-    df_dif = None
+    # Solo se copian las filas con diferencias de cada dataset, sin concatenar antes los dos datasets completos
+    df_difs = []
+    for df, d, source in ((df1, d1, "d1"), (df2, d2, "d2")):
+        dif_by_row = dif_by_key.reindex(d.index).to_numpy()
 
-    for _, dfg in grouped_df:
-        # Si no hay exactamente 2 filas, una por cada dataset, es que algún dataset tiene filas que el otro no
+        # Si alguna clave no está en ambos datasets, es que algún dataset tiene filas que el otro no
         # En ese caso, dichas filas se reportan como diferentes y se señalizan con el signo +
-        if dfg.shape[0] != 2:
-            dfg[COLUMN_NAME_DIFFERENCES] = "+"
-            df_dif = pd.concat([df_dif, dfg], ignore_index=True)
-            continue
-
-        # Comparando los valores en las columnas numéricas.
-        # Si se encuentran diferencias en una fila, se guarda la lista de las columnas con valores diferentes.
-        found_dif = False
-        dif_columns = []
-        for c in compare_columns:
-            if abs(dfg.iloc[0][c] - dfg.iloc[1][c]) > tolerance:
-                found_dif = True
-                dif_columns.append(c)
-        if found_dif:
-            dfg[COLUMN_NAME_DIFFERENCES] = "|".join(dif_columns)
-            df_dif = pd.concat([df_dif, dfg], ignore_index=True)
-
-    return df_dif
+        dif_by_row[~d.index.isin(common_keys)] = "+"
+
+        rows_to_report = pd.notna(dif_by_row)
+        df_difs.append(
+            df[rows_to_report].assign(
+                **{
+                    COLUMN_NAME_SOURCE: source,
+                    COLUMN_NAME_DIFFERENCES: dif_by_row[rows_to_report],
+                }
+            )
+        )
+
+    df_dif = pd.concat(df_difs, ignore_index=True)
+    if df_dif.empty:
+        return None
+
+    # Se ordenan las filas por la clave para que las filas de ambos datasets queden juntas
+    return df_dif.sort_values(key_columns, kind="stable", ignore_index=True)
 
 
 def add_dif_dataframe_rows_to_table(table: Table, df: pd.DataFrame) -> None:
@@ -291,14 +385,24 @@ def add_dif_dataframe_rows_to_table(table: Table, df: pd.DataFrame) -> None:
     Añade las filas de un DataFrame a una Table de la librería Rich.
     Formatea con colores las columnas con diferencias.
     """
-    dif_df_columns = df.columns
+    column_index = {c: i for i, c in enumerate(df.columns)}
+    dif_index = column_index[COLUMN_NAME_DIFFERENCES]
+    # Muchas filas tienen diferencias en las mismas columnas, por lo que las posiciones de las columnas
+    # de cada texto de diferencias se calculan una sola vez
+    dif_positions = {}
+
+    for row in df.itertuples(index=False, name=None):
+        cells = list(row)
 
-    for _, row in df.iterrows():
         # Buscando si hay columnas con valores diferentes para marcarlas en rojo
-        dif = row[COLUMN_NAME_DIFFERENCES]
-        for c in dif.split("|"):
-            if c in dif_df_columns:
-                row[c] = f"[red]{row[c]}[/red]"
+        dif = cells[dif_index]
+        positions = dif_positions.get(dif)
+        if positions is None:
+            positions = [column_index[c] for c in dif.split("|") if c in column_index]
+            dif_positions[dif] = positions
+
+        for i in positions:
+            cells[i] = f"[red]{cells[i]}[/red]"
 
         # Agregando la fila a la tabla
-        table.add_row(*list(row))
+        table.add_row(*cells)
@@ -2,7 +2,6 @@ from pathlib import Path
 
 import typer
 from typing_extensions import Annotated
-from deltalake import DeltaTable
 from rich.console import Console
 from rich.panel import Panel
 
@@ -59,6 +58,8 @@ def delta_command(
         print()
         print(f"Ruta a la tabla Delta: {delta_folder}")
 
+        from deltalake import DeltaTable
+
         dt = DeltaTable(delta_folder)
 
         if delta_optimize:
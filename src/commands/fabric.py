@@ -4,15 +4,21 @@ from enum import StrEnum
 
 import typer
 from typing_extensions import Annotated
-import requests
 from rich import print
 from rich.console import Console
 from rich.table import Table
 
 from utils.azure_api import AZURE_MANAGEMENT_SCOPE, get_access_token
+from utils.http_session import get_http_session, get_json_with_etag
 
 
+# Tiempo máximo de espera, en segundos, para que la capacidad llegue al nuevo estado
 SLEEP_TIME_AFTER_CAPACITY_CHANGE = 15
+# Tiempo de la primera espera entre consultas del estado de la capacidad y factor con el que crece cada espera
+CAPACITY_POLL_INITIAL_SLEEP_TIME = 2
+CAPACITY_POLL_BACKOFF_FACTOR = 1.5
+# Estado en el que queda la capacidad si el cambio de estado no se puede completar
+CAPACITY_FAILED_STATE = "Failed"
 
 
 def get_fabric_capacities(access_token: str, subscription_id: str):
@@ -24,7 +30,7 @@ def get_fabric_capacities(access_token: str, subscription_id: str):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
+    http_response = get_http_session().get(api_url, headers=headers)
     http_response.raise_for_status()
     response_json = http_response.json()
     return response_json["value"]
@@ -41,23 +47,29 @@ def get_fabric_capacity(access_token: str, capacity_id: str):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
-    http_response.raise_for_status()
-    return http_response.json()
+    return get_json_with_etag(api_url, headers)
 
 
 def change_fabric_capacity_state(access_token: str, capacity_id: str, new_state: str):
     """Cambia el estado de una capacidad Fabric.
-    Los estados pueden ser resume o suspend."""
+    Los estados pueden ser resume o suspend.
+    Devuelve los segundos que Azure recomienda esperar antes de consultar si el cambio ha terminado,
+    o None si la respuesta no lo indica."""
     api_url = f"https://management.azure.com{capacity_id}/{new_state}?api-version=2022-07-01-preview"
 
     headers = {
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.post(api_url, headers=headers)
+    http_response = get_http_session().post(api_url, headers=headers)
     http_response.raise_for_status()
-    return http_response.ok
+
+    # El cambio de estado es una operación asíncrona de Azure Resource Manager,
+    # que indica en la cabecera Retry-After cada cuánto tiempo consultar su estado
+    try:
+        return int(http_response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
 
 
 def suspend_fabric_capacity(access_token: str, capacity_id: str):
@@ -79,13 +91,37 @@ def change_fabric_capacity_sku(access_token: str, capacity_id: str, new_sku: str
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.patch(
+    http_response = get_http_session().patch(
         api_url, headers=headers, json={"sku": {"name": new_sku}}
     )
     http_response.raise_for_status()
     return http_response.ok
 
 
+def wait_for_fabric_capacity_state(
+    access_token: str,
+    capacity_id: str,
+    state: str,
+    max_wait_time: float = SLEEP_TIME_AFTER_CAPACITY_CHANGE,
+    initial_sleep_time: float = CAPACITY_POLL_INITIAL_SLEEP_TIME,
+):
+    """Consulta una capacidad Fabric hasta que llegue al estado indicado, hasta que falle o hasta que pase el tiempo máximo de espera.
+    El tiempo entre consultas crece de forma exponencial, para terminar pronto si el cambio es rápido
+    sin hacer demasiadas llamadas a la API si es lento.
+    Devuelve un objeto con las propiedades de la capacidad en la última consulta."""
+    deadline = time.monotonic() + max_wait_time
+    sleep_time = initial_sleep_time
+    while True:
+        time.sleep(max(0, min(sleep_time, deadline - time.monotonic())))
+        capacity = get_fabric_capacity(access_token, capacity_id)
+        if (
+            capacity["properties"]["state"] in (state, CAPACITY_FAILED_STATE)
+            or time.monotonic() >= deadline
+        ):
+            return capacity
+        sleep_time *= CAPACITY_POLL_BACKOFF_FACTOR
+
+
 def print_capacity(capacity):
 
     table = Table(show_header=False, show_lines=True)
@@ -107,7 +143,7 @@ def get_refresh_history(access_token: str, group_id: str, dataset_id: str, top=1
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
+    http_response = get_http_session().get(api_url, headers=headers)
     http_response.raise_for_status()
     response_json = http_response.json()
     return response_json["value"]
@@ -234,18 +270,35 @@ def resume(
     if sku is not None:
         change_fabric_capacity_sku(access_token, capacity_id, sku)
 
-    print("Iniciando la capacidad...")
-    resume_fabric_capacity(access_token, capacity_id)
+    # Solo se pide el cambio de estado si la capacidad no está ya en el estado deseado o cambiando hacia él
     capacity = get_fabric_capacity(access_token, capacity_id)
-    print_capacity(capacity)
+    state = capacity["properties"]["state"]
+    if state == "Active":
+        print("La capacidad ya está activa.")
+        print_capacity(capacity)
+        print()
+        return
+
+    retry_after = None
+    if state == "Resuming":
+        print("La capacidad ya se está iniciando.")
+    else:
+        print("Iniciando la capacidad...")
+        retry_after = resume_fabric_capacity(access_token, capacity_id)
     print()
 
-    print(f"Esperando {SLEEP_TIME_AFTER_CAPACITY_CHANGE} segundos...")
-    time.sleep(SLEEP_TIME_AFTER_CAPACITY_CHANGE)
+    print(
+        f"Esperando a que la capacidad esté activa (máximo {SLEEP_TIME_AFTER_CAPACITY_CHANGE} segundos)..."
+    )
+    capacity = wait_for_fabric_capacity_state(
+        access_token,
+        capacity_id,
+        "Active",
+        initial_sleep_time=retry_after or CAPACITY_POLL_INITIAL_SLEEP_TIME,
+    )
     print()
 
     print("Comprobando el estado de la capacidad:")
-    capacity = get_fabric_capacity(access_token, capacity_id)
     print_capacity(capacity)
     print()
 
@@ -266,17 +319,34 @@ def suspend(
 
     access_token = get_access_token(AZURE_MANAGEMENT_SCOPE)
 
-    print("Pausando la capacidad...")
-    suspend_fabric_capacity(access_token, capacity_id)
+    # Solo se pide el cambio de estado si la capacidad no está ya en el estado deseado o cambiando hacia él
     capacity = get_fabric_capacity(access_token, capacity_id)
-    print_capacity(capacity)
+    state = capacity["properties"]["state"]
+    if state == "Paused":
+        print("La capacidad ya está pausada.")
+        print_capacity(capacity)
+        print()
+        return
+
+    retry_after = None
+    if state == "Pausing":
+        print("La capacidad ya se está pausando.")
+    else:
+        print("Pausando la capacidad...")
+        retry_after = suspend_fabric_capacity(access_token, capacity_id)
     print()
 
-    print(f"Esperando {SLEEP_TIME_AFTER_CAPACITY_CHANGE} segundos...")
-    time.sleep(SLEEP_TIME_AFTER_CAPACITY_CHANGE)
+    print(
+        f"Esperando a que la capacidad esté pausada (máximo {SLEEP_TIME_AFTER_CAPACITY_CHANGE} segundos)..."
+    )
+    capacity = wait_for_fabric_capacity_state(
+        access_token,
+        capacity_id,
+        "Paused",
+        initial_sleep_time=retry_after or CAPACITY_POLL_INITIAL_SLEEP_TIME,
+    )
     print()
 
     print("Comprobando el estado de la capacidad:")
-    capacity = get_fabric_capacity(access_token, capacity_id)
     print_capacity(capacity)
     print()
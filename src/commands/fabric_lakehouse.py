@@ -1,15 +1,17 @@
+import sys
+import json
 import time
 from uuid import UUID
 from enum import StrEnum
 
 import typer
 from typing_extensions import Annotated
-import requests
 from rich import print, print_json
 from rich.console import Console
 from rich.table import Table
 
 from utils.azure_api import get_access_token
+from utils.http_session import get_http_session, get_json_with_etag
 from utils.powerbi_api import POWER_BI_SCOPE
 
 
@@ -25,7 +27,7 @@ def list_lakehouses(access_token: str, workspace_id: str):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
+    http_response = get_http_session().get(api_url, headers=headers)
     http_response.raise_for_status()
     response_json = http_response.json()
     return response_json["value"]
@@ -45,7 +47,7 @@ def create_lakehouse(
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.post(
+    http_response = get_http_session().post(
         api_url,
         headers=headers,
         json={"displayName": display_name, "description": description},
@@ -64,7 +66,7 @@ def delete_lakehouse(access_token: str, workspace_id: str, lakehouse_id: str):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.delete(api_url, headers=headers)
+    http_response = get_http_session().delete(api_url, headers=headers)
     http_response.raise_for_status()
     return http_response.ok
 
@@ -80,9 +82,7 @@ def get_fabric_capacity(access_token: str, capacity_id: str):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
-    http_response.raise_for_status()
-    return http_response.json()
+    return get_json_with_etag(api_url, headers)
 
 
 def change_fabric_capacity_state(access_token: str, capacity_id: str, new_state: str):
@@ -94,7 +94,7 @@ def change_fabric_capacity_state(access_token: str, capacity_id: str, new_state:
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.post(api_url, headers=headers)
+    http_response = get_http_session().post(api_url, headers=headers)
     http_response.raise_for_status()
     return http_response.ok
 
@@ -118,7 +118,7 @@ def change_fabric_capacity_sku(access_token: str, capacity_id: str, new_sku: str
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.patch(
+    http_response = get_http_session().patch(
         api_url, headers=headers, json={"sku": {"name": new_sku}}
     )
     http_response.raise_for_status()
@@ -146,7 +146,7 @@ def get_refresh_history(access_token: str, group_id: str, dataset_id: str, top=1
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(api_url, headers=headers)
+    http_response = get_http_session().get(api_url, headers=headers)
     http_response.raise_for_status()
     response_json = http_response.json()
     return response_json["value"]
@@ -194,9 +194,12 @@ def list(
 
     lakehouses = list_lakehouses(access_token, workspace_id)
 
-    for lh in lakehouses:
-        print_json(data=lh)
-        print()
+    # La lista se imprime de una sola vez. Si la salida no es la consola, por ejemplo si se redirige a un fichero,
+    # se escribe el JSON sin el formato de colores de rich, que es más rápido y más fácil de procesar
+    if sys.stdout.isatty():
+        print_json(data=lakehouses)
+    else:
+        sys.stdout.write(json.dumps(lakehouses, indent=2, ensure_ascii=False) + "\n")
 
 
 @app.command()
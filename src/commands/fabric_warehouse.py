@@ -1,11 +1,12 @@
 from uuid import UUID
+from typing import List
 
 import typer
 from typing_extensions import Annotated
-import requests
 from rich import print_json
 
 from utils.azure_api import get_access_token
+from utils.http_session import get_http_session
 from utils.powerbi_api import POWER_BI_SCOPE
 
 
@@ -19,7 +20,7 @@ def restore_base_command(
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.post(
+    http_response = get_http_session().post(
         api_url,
         headers=headers,
         json=json_body,
@@ -30,16 +31,33 @@ def restore_base_command(
     return response_json
 
 
+def run_warehouse_commands(
+    access_token: str, workspace_id: str, warehouse_id: str, *commands: dict
+):
+    """Ejecuta varios comandos de restauración sobre un Warehouse en una sola llamada a la API.
+    Cada comando es un diccionario con la propiedad $type y sus parámetros."""
+    json_body = {"commands": list(commands)}
+    return restore_base_command(access_token, workspace_id, warehouse_id, json_body)
+
+
 def list_restore_points(access_token: str, workspace_id: str, warehouse_id: str):
     """Obtiene una lista de los puntos de restauración de un Warehouse."""
-    json_body = {"commands": [{"$type": "WarehouseListRestorePointsCommand"}]}
-    return restore_base_command(access_token, workspace_id, warehouse_id, json_body)
+    return run_warehouse_commands(
+        access_token,
+        workspace_id,
+        warehouse_id,
+        {"$type": "WarehouseListRestorePointsCommand"},
+    )
 
 
 def create_restore_point(access_token: str, workspace_id: str, warehouse_id: str):
     """Crea un punto de restauración definido por el usuario."""
-    json_body = {"commands": [{"$type": "WarehouseCreateRestorePointCommand"}]}
-    return restore_base_command(access_token, workspace_id, warehouse_id, json_body)
+    return run_warehouse_commands(
+        access_token,
+        workspace_id,
+        warehouse_id,
+        {"$type": "WarehouseCreateRestorePointCommand"},
+    )
 
 
 def restore_warehouse(
@@ -49,33 +67,34 @@ def restore_warehouse(
     restore_point_create_time: str,
 ):
     """Restaura un Warehouse al punto de restauración indicado por la fecha y hora de creación."""
-    json_body = {
-        "commands": [
-            {
-                "$type": "WarehouseRestoreInPlaceCommand",
-                "RestorePoint": restore_point_create_time,
-            }
-        ]
-    }
-    return restore_base_command(access_token, workspace_id, warehouse_id, json_body)
+    return run_warehouse_commands(
+        access_token,
+        workspace_id,
+        warehouse_id,
+        {
+            "$type": "WarehouseRestoreInPlaceCommand",
+            "RestorePoint": restore_point_create_time,
+        },
+    )
 
 
-def delete_restore_point(
+def delete_restore_points(
     access_token: str,
     workspace_id: str,
     warehouse_id: str,
-    restore_point_create_time: str,
+    restore_points_create_times: List[str],
 ):
-    """Borra un punto de restauración creado por el usuario identificado por la fecha y hora de creación."""
-    json_body = {
-        "commands": [
-            {
-                "$type": "WarehouseDeleteRestorePointsCommand",
-                "RestorePointsToDelete": [restore_point_create_time],
-            }
-        ]
-    }
-    return restore_base_command(access_token, workspace_id, warehouse_id, json_body)
+    """Borra uno o varios puntos de restauración creados por el usuario identificados por la fecha y hora de creación.
+    Todos los puntos de restauración se borran en una sola llamada a la API."""
+    return run_warehouse_commands(
+        access_token,
+        workspace_id,
+        warehouse_id,
+        {
+            "$type": "WarehouseDeleteRestorePointsCommand",
+            "RestorePointsToDelete": list(restore_points_create_times),
+        },
+    )
 
 
 app = typer.Typer(add_completion=False)
@@ -221,20 +240,20 @@ def delrestpoint(
             show_default=False,
         ),
     ],
-    restore_point: Annotated[
-        str,
+    restore_points: Annotated[
+        List[str],
         typer.Option(
             "--restpoint",
             "-rp",
-            help="Fecha y hora de creación del punto de restauración-",
+            help="Fecha y hora de creación del punto de restauración. Para borrar varios puntos de restauración, utilice esta opción varias veces.",
             show_default=False,
         ),
     ],
 ):
-    """Borra un punto de restauración creado por el usuario identificado por su fecha y hora de creación."""
+    """Borra uno o varios puntos de restauración creados por el usuario identificados por su fecha y hora de creación."""
 
     access_token = get_access_token(POWER_BI_SCOPE)
 
-    r = delete_restore_point(access_token, workspace_id, warehouse_id, restore_point)
+    r = delete_restore_points(access_token, workspace_id, warehouse_id, restore_points)
 
     print_json(data=r)
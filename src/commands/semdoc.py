@@ -9,28 +9,57 @@ ficheros separados, para que todo esté contendio dentro del EXE y no tener que
 distribuir ningún fichero adicional.
 """
 
+from __future__ import annotations
+
 from pathlib import Path
 from uuid import UUID
+from concurrent.futures import ThreadPoolExecutor
 import os
 from datetime import datetime
 import webbrowser
 import sys
+from typing import TYPE_CHECKING
 
 import typer
 from typing_extensions import Annotated
-import pandas as pd
-from jinja2 import Environment, DictLoader
-from requests import HTTPError
 from rich import print, inspect
 from rich.console import Console
 from rich.panel import Panel
 
-
 from utils.azure_api import get_access_token
 from utils.powerbi_api import POWER_BI_SCOPE, execute_dax, get_dataset
 from utils.dax_utils import load_dax_result_to_dataframe
 import utils.tom as tom
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from jinja2 import BytecodeCache, Template
+
+# Tabla de traducción que elimina los corchetes de los nombres de las columnas devueltas por las consultas DAX
+COLUMN_NAME_BRACKETS = str.maketrans("", "", "[]")
+
+# Nombres de los valores de los Enum de TOM que se muestran en las páginas
+DATA_TYPE_NAMES = {data_type.value: data_type.name for data_type in tom.DataType}
+AGGREGATE_FUNCTION_NAMES = {
+    aggregate_function.value: aggregate_function.name
+    for aggregate_function in tom.AggregateFunction
+}
+
+# Flecha del diagrama mermaid según si la relación filtra en ambas direcciones y si está activa
+MERMAID_ARROWS = {
+    (True, True): "<-->",
+    (False, True): "-->",
+    (True, False): "<-.->",
+    (False, False): "-.->",
+}
+# Cardinalidad del diagrama mermaid según si cada extremo de la relación es 'uno'
+MERMAID_CARDINALITIES = {
+    (True, True): "|1..1|",
+    (True, False): "|1..*|",
+    (False, True): "|*..1|",
+    (False, False): "|*..*|",
+}
+
 
 def semdoc_command(
     data_set: Annotated[
@@ -63,6 +92,9 @@ def semdoc_command(
 ):
     """Genera páginas HTML con documentación de un modelo semántico publicado en el servicio de Power BI."""
 
+    from jinja2 import Environment, DictLoader
+    from requests import HTTPError
+
     console = Console()
 
     # Valor por defecto de la carpeta de salida
@@ -89,24 +121,54 @@ def semdoc_command(
     print(f"Preparando la carpeta para guardar las páginas HTML: {output}")
     prepare_output_folder(output)
 
-    environment = Environment(loader=DictLoader(jinja_templates))
+    # Las plantillas se compilan una sola vez y se reutilizan para todas las páginas
+    environment = Environment(
+        loader=DictLoader(jinja_templates),
+        auto_reload=False,
+        bytecode_cache=get_jinja_bytecode_cache(),
+    )
+    model_template = environment.get_template("model.html")
+    table_template = environment.get_template("table.html")
 
     html_file_model = f"{output}/model.html"
     print(f"Generando la página HTML del modelo: {html_file_model}")
-    generate_model_page(environment, "model.html", html_file_model, semantic_model)
+    generate_model_page(model_template, html_file_model, semantic_model)
 
-    for table_id in semantic_model["tables"]["ID"]:
-        html_file_table = f"{output}/table_{table_id}.html"
-        print(
-            f"Generando la página HTML para la tabla del modelo con el ID {table_id} en: {html_file_table}"
-        )
-        generate_table_page(
-            table_id,
-            environment,
-            "table.html",
-            html_file_table,
-            semantic_model,
-        )
+    # Las filas de cada tabla se separan una sola vez, en lugar de filtrar los DataFrames completos en cada página
+    semantic_model["tables_by_id"] = semantic_model["tables"].set_index(
+        "ID", drop=False
+    )
+    semantic_model["columns_by_table"] = get_rows_by_table(
+        semantic_model["columns"], "TableID"
+    )
+    semantic_model["measures_by_table"] = get_rows_by_table(
+        semantic_model["measures"], "TableID"
+    )
+    semantic_model["relationships_by_table"] = get_rows_by_table(
+        semantic_model["relationships"], "FromTableID", "ToTableID"
+    )
+
+    # Las páginas de las tablas son independientes, por lo que se generan y se escriben a la vez
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = []
+        for table_id in semantic_model["tables"]["ID"]:
+            html_file_table = f"{output}/table_{table_id}.html"
+            print(
+                f"Generando la página HTML para la tabla del modelo con el ID {table_id} en: {html_file_table}"
+            )
+            futures.append(
+                executor.submit(
+                    generate_table_page,
+                    table_id,
+                    table_template,
+                    html_file_table,
+                    semantic_model,
+                )
+            )
+
+        # Si alguna página no se ha podido generar, se lanza aquí su excepción
+        for future in futures:
+            future.result()
 
     print(f"Ya todo está listo en la carpeta: {output}")
 
@@ -117,22 +179,39 @@ def semdoc_command(
         webbrowser.open(f"file://{os.path.abspath(html_file_model)}")
 
 
+def get_jinja_bytecode_cache() -> BytecodeCache | None:
+    """Devuelve una caché en disco para el código compilado de las plantillas Jinja.
+    Así las plantillas solo se compilan la primera vez que se ejecuta el comando, o cuando cambian.
+    Si no se puede crear la carpeta de la caché, devuelve None y las plantillas se compilan en cada ejecución.
+    """
+    from jinja2 import FileSystemBytecodeCache
+
+    try:
+        # Sin indicar una carpeta, Jinja utiliza una carpeta temporal que solo es accesible para el usuario
+        return FileSystemBytecodeCache()
+    except (OSError, RuntimeError):
+        return None
+
+
 def prepare_output_folder(output):
     """Crear la carpeta de salida, sino existe.
     Y si existe, elimina los ficheros HTML que contenga."""
     if not os.path.exists(output):
         os.makedirs(output)
     else:
-        for file in Path(output).glob("*"):
-            if file.is_file() and file.match("model.html"):
-                file.unlink()
-            if file.is_file() and file.match("table_*.html"):
-                file.unlink()
+        with os.scandir(output) as entries:
+            for entry in entries:
+                if entry.is_file() and (
+                    entry.name == "model.html"
+                    or (
+                        entry.name.startswith("table_") and entry.name.endswith(".html")
+                    )
+                ):
+                    os.unlink(entry.path)
 
 
 def generate_model_page(
-    jinja_environment: Environment,
-    jinja_template: str,
+    jinja_template: Template,
     html_file_path: str,
     semantic_model,
 ):
@@ -146,22 +225,18 @@ def generate_model_page(
     relationships = semantic_model["relationships"]
 
     mermaid_diagram = generate_mermaid_relationships(tables, relationships)
-    template = jinja_environment.get_template(jinja_template)
 
-    html_content = template.render(
+    jinja_template.stream(
         generation_time=semantic_model["generation_time"],
         dataset_info=dataset_info,
         model_info=model_info,
         mermaid_diagram=mermaid_diagram,
-    )
-    with open(html_file_path, mode="w", encoding="utf-8") as f:
-        f.write(html_content)
+    ).dump(html_file_path, encoding="utf-8")
 
 
 def generate_table_page(
     table_id: int,
-    jinja_environment: Environment,
-    jinja_template: str,
+    jinja_template: Template,
     html_file_path: str,
     semantic_model,
 ):
@@ -169,59 +244,55 @@ def generate_table_page(
     Utiliza la plantilla de Jira table.html.
 
     """
+    import numpy as np
+    import pandas as pd
 
     dataset_info = semantic_model["dataset_info"]
     tables = semantic_model["tables"]
+    tables_by_id = semantic_model["tables_by_id"]
     columns = semantic_model["columns"]
     measures = semantic_model["measures"]
     relationships = semantic_model["relationships"]
+    columns_by_table = semantic_model["columns_by_table"]
+    measures_by_table = semantic_model["measures_by_table"]
+    relationships_by_table = semantic_model["relationships_by_table"]
     calculation_groups = semantic_model["calculation_groups"]
     calculation_items = semantic_model["calculation_items"]
 
     # Datos de la tabla
-    t = tables[tables["ID"] == table_id].iloc[0].to_dict()
+    t = tables_by_id.loc[table_id].to_dict()
     table_name = t["Name"]
     table_visibility = "Oculta" if t["IsHidden"] else ""
     table_description = t["Description"]
 
-    # Columnas de la tabla
-    columns = columns[columns["TableID"] == table_id]
-    table_columns = []
-    for _, c in columns.iterrows():
-        # No tener en cuenta la columna Row_Number
-        if c["Type"] == tom.ColumnType.ROW_NUMBER:
-            continue
-
-        tc = {}
-        tc["name"] = c["Name"]
-        tc["visibility"] = "Oculta" if c["IsHidden"] else ""
-        tc["data_type"] = (
-            c["InferredDataType"].name
-            if c["InferredDataType"] != tom.DataType.UNKNOWN
-            else c["ExplicitDataType"].name
-        )
-        tc["format_string"] = ";<br>".join(str(c["FormatString"]).split(";"))
-        tc["summarize_by"] = (
-            c["SummarizeBy"].name
-            if c["SummarizeBy"] != tom.AggregateFunction.NONE
-            else ""
-        )
-        tc["sort_by"] = c["SortByColumnName"]
-        tc["description"] = c["Description"]
-        table_columns.append(tc)
+    # Columnas de la tabla, sin tener en cuenta la columna Row_Number
+    # Los valores de cada columna de la página se calculan para todas las filas a la vez, en lugar de recorrer las filas con iterrows
+    columns = columns_by_table.get(table_id, columns.iloc[:0])
+    columns = columns[columns["Type"] != tom.ColumnType.ROW_NUMBER]
+    table_columns = pd.DataFrame(
+        {
+            "name": columns["Name"],
+            "visibility": np.where(columns["IsHidden"], "Oculta", ""),
+            "data_type": columns["DataTypeName"],
+            "format_string": columns["FormatStringHtml"],
+            "summarize_by": columns["SummarizeByName"],
+            "sort_by": columns["SortByColumnName"],
+            "description": columns["Description"],
+        }
+    ).to_dict("records")
 
     # Medidas de la tabla
-    measures = measures[measures["TableID"] == table_id]
-    table_measures = []
-    for _, m in measures.iterrows():
-        tm = {}
-        tm["name"] = m["Name"]
-        tm["visibility"] = "Oculta" if m["IsHidden"] else ""
-        tm["data_type"] = m["DataType"].name
-        tm["format_string"] = ";<br>".join(str(m["FormatString"]).split(";"))
-        tm["expression"] = m["Expression"]
-        tm["description"] = m["Description"]
-        table_measures.append(tm)
+    measures = measures_by_table.get(table_id, measures.iloc[:0])
+    table_measures = pd.DataFrame(
+        {
+            "name": measures["Name"],
+            "visibility": np.where(measures["IsHidden"], "Oculta", ""),
+            "data_type": measures["DataTypeName"],
+            "format_string": measures["FormatStringHtml"],
+            "expression": measures["Expression"],
+            "description": measures["Description"],
+        }
+    ).to_dict("records")
 
     # Grupo de cálculo asociado a esta tabla, si hay alguno
 
@@ -236,19 +307,14 @@ def generate_table_page(
             calculation_items = calculation_items[
                 calculation_items["CalculationGroupID"] == cg["ID"]
             ]
-            for _, ci in calculation_items.iterrows():
-                tci = {}
-                tci["name"] = ci["Name"]
-                tci["expression"] = ci["Expression"]
-                tci["ordinal"] = ci["Ordinal"]
-                tci["description"] = ci["Description"]
-                table_calculation_items.append(tci)
+            table_calculation_items = (
+                calculation_items[["Name", "Expression", "Ordinal", "Description"]]
+                .rename(columns=str.lower)
+                .to_dict("records")
+            )
 
     # Filtra las relaciones que corresponden a table_id.
-    relationships = relationships[
-        (relationships["FromTableID"] == table_id)
-        | (relationships["ToTableID"] == table_id)
-    ]
+    relationships = relationships_by_table.get(table_id, relationships.iloc[:0])
     # Dibuja el diagrama de relaciones con esta tabla
     mermaid_diagram = generate_mermaid_relationships(
         tables, relationships, show_disconnected_tables=False
@@ -256,9 +322,7 @@ def generate_table_page(
 
     # Creando la página HTML a partir de la plantilla
 
-    template = jinja_environment.get_template(jinja_template)
-
-    html_content = template.render(
+    jinja_template.stream(
         generation_time=semantic_model["generation_time"],
         dataset_info=dataset_info,
         table_name=table_name,
@@ -268,9 +332,30 @@ def generate_table_page(
         table_measures=table_measures,
         table_calculation_items=table_calculation_items,
         mermaid_diagram_relationships=mermaid_diagram,
-    )
-    with open(html_file_path, mode="w", encoding="utf-8") as f:
-        f.write(html_content)
+    ).dump(html_file_path, encoding="utf-8")
+
+
+def get_rows_by_table(df: pd.DataFrame, *table_id_columns: str) -> dict:
+    """Devuelve un diccionario con las filas de un DataFrame que corresponden a cada ID de tabla.
+    Una fila corresponde a una tabla si alguna de las columnas indicadas tiene su ID, por ejemplo, FromTableID o ToTableID en las relaciones.
+    Las filas de cada tabla mantienen el orden que tienen en el DataFrame.
+    """
+    import numpy as np
+
+    if df.empty:
+        return {}
+
+    positions_by_table = {}
+    for table_id_column in table_id_columns:
+        groups = df.groupby(table_id_column, sort=False).indices
+        for table_id, positions in groups.items():
+            positions_by_table.setdefault(table_id, []).append(positions)
+
+    # np.unique ordena las posiciones y elimina las repetidas, como las de una relación de una tabla consigo misma
+    return {
+        table_id: df.iloc[np.unique(np.concatenate(positions))]
+        for table_id, positions in positions_by_table.items()
+    }
 
 
 def generate_mermaid_relationships(
@@ -279,96 +364,95 @@ def generate_mermaid_relationships(
     show_disconnected_tables: bool = True,
 ) -> str:
     """Genera el código mermaid para dibujar un diagrama que represente las relaciones entre las tablas del modelo."""
-    tables_ids_in_relationships = list(
-        set(relationships["FromTableID"]) | set(relationships["ToTableID"])
-    )
-    tables_in_relationships = pd.DataFrame(tables_ids_in_relationships, columns=["ID"])
-    tables_in_relationships = tables_in_relationships.merge(
-        tables[["ID", "Name"]], on="ID"
-    )
+    # Nombre de cada tabla por su ID
+    tables_names = dict(zip(tables["ID"], tables["Name"]))
 
-    disconnected_tables = tables[~tables["ID"].isin(tables_ids_in_relationships)]
-    disconnected_tables = disconnected_tables[["ID", "Name"]]
+    tables_ids_in_relationships = set(relationships["FromTableID"]) | set(
+        relationships["ToTableID"]
+    )
+    tables_ids_connected = [
+        table_id for table_id in tables_ids_in_relationships if table_id in tables_names
+    ]
+    tables_ids_disconnected = [
+        table_id
+        for table_id in tables_names
+        if table_id not in tables_ids_in_relationships
+    ]
 
-    mermaid_diagram = ""
+    # Las líneas del diagrama se acumulan en una lista y se unen al final, en lugar de concatenar textos
+    mermaid_lines = []
 
-    for _, r in tables_in_relationships.iterrows():
-        mermaid_diagram += f'T{r["ID"]}[{r["Name"]}]\n'
+    for table_id in tables_ids_connected:
+        mermaid_lines.append(f"T{table_id}[{tables_names[table_id]}]\n")
 
-    for _, r in relationships.iterrows():
-        left_table = f'T{r["ToTableID"]}'
-        right_table = f'T{r["FromTableID"]}'
+    for r in relationships.itertuples(index=False):
+        left_table = f"T{r.ToTableID}"
+        right_table = f"T{r.FromTableID}"
 
-        is_active = r["IsActive"]
         is_both_directions = (
-            tom.CrossFilteringBehavior(r["CrossFilteringBehavior"])
-            == tom.CrossFilteringBehavior.BOTHDIRECTIONS
+            r.CrossFilteringBehavior == tom.CrossFilteringBehavior.BOTHDIRECTIONS
         )
-        arrow = ""
-        if is_both_directions:
-            arrow += "<"
-        if is_active:
-            arrow += "-->"
-        else:
-            arrow += "-.->"
-
-        left_cardinality = tom.RelationshipEndCardinality(r["ToCardinality"])
-        right_cardinality = tom.RelationshipEndCardinality(r["FromCardinality"])
-        cardinality = "|"
-        if left_cardinality == tom.RelationshipEndCardinality.ONE:
-            cardinality += "1.."
-        else:
-            cardinality += "*.."
-        if right_cardinality == tom.RelationshipEndCardinality.ONE:
-            cardinality += "1"
-        else:
-            cardinality += "*"
-        cardinality += "|"
-
-        mermaid_diagram += f"{left_table} {arrow} {cardinality} {right_table} \n"
+        arrow = MERMAID_ARROWS[(is_both_directions, bool(r.IsActive))]
+
+        cardinality = MERMAID_CARDINALITIES[
+            (
+                r.ToCardinality == tom.RelationshipEndCardinality.ONE,
+                r.FromCardinality == tom.RelationshipEndCardinality.ONE,
+            )
+        ]
+
+        mermaid_lines.append(f"{left_table} {arrow} {cardinality} {right_table} \n")
 
     if show_disconnected_tables:
-        for _, r in disconnected_tables.iterrows():
-            mermaid_diagram += f'T{r["ID"]}[{r["Name"]}]\n'
+        for table_id in tables_ids_disconnected:
+            mermaid_lines.append(f"T{table_id}[{tables_names[table_id]}]\n")
 
-    for _, r in tables_in_relationships.iterrows():
-        mermaid_diagram += f'click T{r["ID"]} "table_{r["ID"]}.html"\n'
+    for table_id in tables_ids_connected:
+        mermaid_lines.append(f'click T{table_id} "table_{table_id}.html"\n')
 
     if show_disconnected_tables:
-        for _, r in disconnected_tables.iterrows():
-            mermaid_diagram += f'click T{r["ID"]} "table_{r["ID"]}.html"\n'
+        for table_id in tables_ids_disconnected:
+            mermaid_lines.append(f'click T{table_id} "table_{table_id}.html"\n')
 
     # Si no hay datos en el diagrama, devolver una texto vacío
-    if mermaid_diagram == "":
+    if not mermaid_lines:
         return ""
 
     # Si hay datos, comenzar el texto indicando el tipo de gráfico que debe dibujar mermaid
-    mermaid_diagram = "graph LR\n" + mermaid_diagram
-
-    return mermaid_diagram
+    return "graph LR\n" + "".join(mermaid_lines)
 
 
 def get_semantic_model(access_token: str, dataset_id: UUID):
-    """Devuelve un diccionario con información sobre un modelo semántico publicado en el servicio de Power BI."""
-    dataset_info = get_dataset(access_token, dataset_id)
-    model_info = get_model_info(access_token, dataset_id)
-    tables = get_model_tables(access_token, dataset_id)
-    columns = get_model_columns(access_token, dataset_id)
-    measures = get_model_measures(access_token, dataset_id)
-    relationships = get_model_relationships(access_token, dataset_id, tables)
-    calculation_groups = get_model_calculation_groups(access_token, dataset_id)
-    calculation_items = get_model_calculation_items(access_token, dataset_id)
+    """Devuelve un diccionario con información sobre un modelo semántico publicado en el servicio de Power BI.
+    Las llamadas a la API son independientes entre sí, por lo que se hacen a la vez.
+    """
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        dataset_info = executor.submit(get_dataset, access_token, dataset_id)
+        model_info = executor.submit(get_model_info, access_token, dataset_id)
+        tables = executor.submit(get_model_tables, access_token, dataset_id)
+        columns = executor.submit(get_model_columns, access_token, dataset_id)
+        measures = executor.submit(get_model_measures, access_token, dataset_id)
+        calculation_groups = executor.submit(
+            get_model_calculation_groups, access_token, dataset_id
+        )
+        calculation_items = executor.submit(
+            get_model_calculation_items, access_token, dataset_id
+        )
+        # Las relaciones necesitan los nombres de las tablas, por lo que se piden cuando estas ya se han obtenido
+        relationships = executor.submit(
+            get_model_relationships, access_token, dataset_id, tables.result()
+        )
 
     return {
         "generation_time": datetime.now().replace(microsecond=0).isoformat(),
-        "dataset_info": dataset_info,
-        "model_info": model_info,
-        "tables": tables,
-        "columns": columns,
-        "measures": measures,
-        "relationships": relationships,
-        "calculation_groups": calculation_groups,
-        "calculation_items": calculation_items,
+        "dataset_info": dataset_info.result(),
+        "model_info": model_info.result(),
+        "tables": tables.result(),
+        "columns": columns.result(),
+        "measures": measures.result(),
+        "relationships": relationships.result(),
+        "calculation_groups": calculation_groups.result(),
+        "calculation_items": calculation_items.result(),
     }
 
 
@@ -377,9 +461,7 @@ def get_model_info(access_token: str, dataset_id: UUID):
     dax_query = "EVALUATE INFO.MODEL()"
     model = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
-    model["Description"] = model["Description"].apply(
-        lambda v: v if pd.notna(v) else ""
-    )
+    model["Description"] = model["Description"].fillna("")
 
     return model.iloc[0].to_dict()
 
@@ -389,15 +471,15 @@ def get_model_tables(access_token: str, dataset_id: UUID) -> pd.DataFrame:
     dax_query = "EVALUATE INFO.TABLES()"
     tables = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
-    tables["Description"] = tables["Description"].apply(
-        lambda v: v if pd.notna(v) else ""
-    )
+    tables["Description"] = tables["Description"].fillna("")
 
     return tables
 
 
 def get_model_columns(access_token: str, dataset_id: UUID) -> pd.DataFrame:
     """Devuelve la lista de columnas del modelo."""
+    import pandas as pd
+
     dax_query = "EVALUATE INFO.COLUMNS()"
     columns = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
@@ -405,34 +487,37 @@ def get_model_columns(access_token: str, dataset_id: UUID) -> pd.DataFrame:
     columns["ID"] = columns["ID"].astype("Int64")
     columns["SortByColumnID"] = columns["SortByColumnID"].astype("Int64")
 
-    # Aplicando los Enum de TOM
-    columns["Type"] = columns["Type"].apply(tom.ColumnType)
-    columns["ExplicitDataType"] = columns["ExplicitDataType"].apply(tom.DataType)
-    columns["InferredDataType"] = columns["InferredDataType"].apply(tom.DataType)
-    columns["SummarizeBy"] = columns["SummarizeBy"].apply(tom.AggregateFunction)
-
-    # Decidiendo cual es el nombre de la columna
-    columns["Name"] = columns.apply(
-        lambda c: (
-            c["ExplicitName"] if pd.notna(c["ExplicitName"]) else c["InferredName"]
-        ),
-        axis=1,
+    # Traduciendo los valores de los Enum de TOM a sus nombres, sin crear una instancia del Enum por cada fila
+    # El tipo de datos es el inferido, salvo que sea desconocido
+    columns["DataTypeName"] = (
+        columns["InferredDataType"]
+        .where(
+            columns["InferredDataType"] != tom.DataType.UNKNOWN,
+            columns["ExplicitDataType"],
+        )
+        .map(DATA_TYPE_NAMES)
+    )
+    columns["SummarizeByName"] = (
+        columns["SummarizeBy"]
+        .map(AGGREGATE_FUNCTION_NAMES)
+        .where(columns["SummarizeBy"] != tom.AggregateFunction.NONE, "")
     )
 
+    # Decidiendo cual es el nombre de la columna: el explícito si lo tiene y si no, el inferido
+    columns["Name"] = columns["ExplicitName"].fillna(columns["InferredName"])
+
     # JOIN con las misma tabla para agregar una columna con el nombre de la clumna SortByColumn
     columns_sort_by = columns[["ID", "Name"]]
     columns_sort_by.columns = ["SortByColumnID", "SortByColumnName"]
     columns = pd.merge(columns, columns_sort_by, how="left", on="SortByColumnID")
-    columns["SortByColumnName"] = columns["SortByColumnName"].apply(
-        lambda v: v if pd.notna(v) else ""
-    )
+    columns["SortByColumnName"] = columns["SortByColumnName"].fillna("")
 
     # Sustituyendo nan por un texto vacío
-    columns["Description"] = columns["Description"].apply(
-        lambda v: v if pd.notna(v) else ""
-    )
-    columns["FormatString"] = columns["FormatString"].apply(
-        lambda v: v if pd.notna(v) else ""
+    columns["Description"] = columns["Description"].fillna("")
+    columns["FormatString"] = columns["FormatString"].astype("string").fillna("")
+    # Cadena de formato para el HTML, con un salto de línea después de cada ';'
+    columns["FormatStringHtml"] = columns["FormatString"].str.replace(
+        ";", ";<br>", regex=False
     )
 
     return columns
@@ -443,13 +528,13 @@ def get_model_measures(access_token: str, dataset_id: UUID) -> pd.DataFrame:
     dax_query = "EVALUATE INFO.MEASURES()"
     measures = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
-    measures["DataType"] = measures["DataType"].apply(tom.DataType)
+    measures["DataTypeName"] = measures["DataType"].map(DATA_TYPE_NAMES)
 
-    measures["Description"] = measures["Description"].apply(
-        lambda v: v if pd.notna(v) else ""
-    )
-    measures["FormatString"] = measures["FormatString"].apply(
-        lambda v: v if pd.notna(v) else ""
+    measures["Description"] = measures["Description"].fillna("")
+    measures["FormatString"] = measures["FormatString"].astype("string").fillna("")
+    # Cadena de formato para el HTML, con un salto de línea después de cada ';'
+    measures["FormatStringHtml"] = measures["FormatString"].str.replace(
+        ";", ";<br>", regex=False
     )
 
     return measures
@@ -462,15 +547,10 @@ def get_model_relationships(
     dax_query = "EVALUATE INFO.RELATIONSHIPS()"
     relationships = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
-    tables_rel_from = tables[["ID", "Name"]]
-    tables_rel_from.columns = ["FromTableID", "FromTableName"]
-    relationships = pd.merge(
-        relationships, tables_rel_from, how="left", on="FromTableID"
-    )
-
-    tables_rel_to = tables[["ID", "Name"]]
-    tables_rel_to.columns = ["ToTableID", "ToTableName"]
-    relationships = pd.merge(relationships, tables_rel_to, how="left", on="ToTableID")
+    # Agregando los nombres de las tablas de cada extremo de la relación
+    tables_names = dict(zip(tables["ID"], tables["Name"]))
+    relationships["FromTableName"] = relationships["FromTableID"].map(tables_names)
+    relationships["ToTableName"] = relationships["ToTableID"].map(tables_names)
     return relationships
 
 
@@ -480,7 +560,7 @@ def get_model_calculation_groups(access_token: str, dataset_id: UUID) -> pd.Data
     cg = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
     if not cg.empty:
-        cg["Description"] = cg["Description"].apply(lambda v: v if pd.notna(v) else "")
+        cg["Description"] = cg["Description"].fillna("")
 
     return cg
 
@@ -491,7 +571,7 @@ def get_model_calculation_items(access_token: str, dataset_id: UUID) -> pd.DataF
     ci = execute_dax_to_dataframe(access_token, dataset_id, dax_query)
 
     if not ci.empty:
-        ci["Description"] = ci["Description"].apply(lambda v: v if pd.notna(v) else "")
+        ci["Description"] = ci["Description"].fillna("")
 
     return ci
 
@@ -505,7 +585,7 @@ def execute_dax_to_dataframe(
 
     if not df.empty:
         # Quitando los corchetes de los nombres de las columnas
-        df.columns = df.columns.str.replace(r"[\[\]]", "", regex=True)
+        df.columns = [c.translate(COLUMN_NAME_BRACKETS) for c in df.columns]
 
     return df
 
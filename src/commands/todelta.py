@@ -1,18 +1,17 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from enum import StrEnum
 from pathlib import Path
-import csv
-import json
 
 import typer
 from typing_extensions import Annotated
-from pyarrow import csv as pacsv
-import pyarrow as pa
-import pandas as pd
-from deltalake import write_deltalake
 from rich.console import Console
 from rich.panel import Panel
 
+import utils.csv_utils as csv_utils
+import utils.json_utils as json_utils
+from utils.path_utils import find_files
+
 
 class DeltaMode(StrEnum):
     append = "append"
@@ -35,32 +34,339 @@ def convert_csv_to_delta(
     schema_mode="merge",
     csv_delimiter=None,
     file_name_column=None,
+    newlines_in_values=False,
+    conversion_errors=None,
 ):
     if csv_delimiter is None:
-        try:
-            with open(csv_file, newline="", encoding="utf-8") as csvfile:
-                dialect = csv.Sniffer().sniff(csvfile.read(10_000))
-                csv_delimiter = dialect.delimiter
-        except Exception as ex:
-            raise CsvDelimiterNotDetected(
-                f"no se pudo detectar el deimitador de celdas del archivo csv: {csv_file}"
+        csv_delimiter = detect_csv_delimiter(csv_file)
+
+    if conversion_errors is None:
+        conversion_errors = []
+
+    import pyarrow as pa
+    from deltalake import write_deltalake
+
+    # El archivo se lee por bloques de filas que se van escribiendo en la tabla Delta, sin cargarlo completo en memoria
+    with csv_utils.open_csv(
+        csv_file, csv_delimiter, newlines_in_values=newlines_in_values
+    ) as reader:
+        schema = reader.schema
+        batches = reader
+
+        # Añadiendo una columna con el nombre del archivo, sin la extensión, a cada bloque de filas.
+        if file_name_column is not None:
+            file_name = Path(csv_file).stem
+            schema = schema.append(pa.field(file_name_column, pa.string()))
+            batches = (
+                pa.RecordBatch.from_arrays(
+                    batch.columns + [pa.array([file_name] * batch.num_rows)],
+                    schema=schema,
+                )
+                for batch in reader
             )
 
-    parse_options = pacsv.ParseOptions(delimiter=csv_delimiter)
+        data = pa.RecordBatchReader.from_batches(
+            schema, record_conversion_errors(batches, conversion_errors)
+        )
+        write_deltalake(
+            delta_folder, data, mode=delta_mode, schema_mode=schema_mode, engine="rust"
+        )
 
-    t = pacsv.read_csv(csv_file, parse_options=parse_options)
 
-    # Añadiendo una fila con el nombre del archivo, sin la extensión.
-    if file_name_column is not None:
-        file_name = Path(csv_file).stem
-        new_column = pa.array([file_name] * len(t))
-        t = t.append_column(file_name_column, new_column)
+def convert_csv_files_to_delta(
+    csv_files,
+    delta_folder,
+    delta_mode="error",
+    schema_mode="merge",
+    csv_delimiter=None,
+    file_name_column=None,
+    newlines_in_values=False,
+):
+    """Convierte varios archivos CSV a una tabla Delta.
+    Todos los archivos se escriben en una sola transacción de la tabla Delta, en lugar de hacer una transacción por archivo,
+    aunque no tengan todos las mismas columnas. Los archivos se leen por bloques, por lo que no se cargan completos en memoria.
+    Los tipos de las columnas se infieren con el primer bloque de cada archivo. Si un bloque posterior tiene valores de otro tipo,
+    la transacción falla sin escribir nada en la tabla Delta. Entonces, se leen los archivos completos, uno tras otro, para conocer los tipos
+    de todas las columnas y se vuelven a escribir por bloques con esos tipos.
+    """
+    # Si la carpeta no tiene archivos que cumplan con el patrón, no hay nada que escribir
+    if not csv_files:
+        return
+
+    # Se detectan los delimitadores de todos los archivos antes de escribir, para no dejar la tabla Delta a medias si falla alguno
+    csv_files = [
+        (
+            csv_file,
+            (
+                csv_delimiter
+                if csv_delimiter is not None
+                else detect_csv_delimiter(csv_file)
+            ),
+        )
+        for csv_file in csv_files
+    ]
 
-    write_deltalake(
-        delta_folder, t, mode=delta_mode, schema_mode=schema_mode, engine="rust"
+    # Errores de conversión de los bloques de filas que se producen mientras deltalake los lee
+    conversion_errors = []
+    try:
+        # Con un solo archivo no hace falta conocer su esquema de antemano, se escribe en la tabla Delta a medida que se lee
+        if len(csv_files) == 1:
+            csv_file, delimiter = csv_files[0]
+            convert_csv_to_delta(
+                csv_file,
+                delta_folder,
+                delta_mode,
+                schema_mode,
+                delimiter,
+                file_name_column,
+                newlines_in_values,
+                conversion_errors,
+            )
+        else:
+            stream_csv_files_to_delta(
+                csv_files,
+                delta_folder,
+                delta_mode,
+                schema_mode,
+                file_name_column,
+                newlines_in_values,
+                conversion_errors,
+            )
+        return
+    except BaseException:
+        # deltalake envuelve en otra excepción los errores que se producen mientras lee los bloques,
+        # y algunas versiones los convierten en un pánico de Rust, que no deriva de Exception.
+        # Por eso se decide a partir de los errores de conversión registrados y no del tipo de la excepción.
+        if not conversion_errors:
+            raise
+
+    print(
+        "Los tipos de algunas columnas cambian después del primer bloque de filas. Se vuelven a leer los archivos completos."
+    )
+    stream_csv_files_to_delta(
+        csv_files,
+        delta_folder,
+        delta_mode,
+        schema_mode,
+        file_name_column,
+        newlines_in_values,
+        column_types=get_csv_files_column_types(csv_files, newlines_in_values),
     )
 
 
+def stream_csv_files_to_delta(
+    csv_files,
+    delta_folder,
+    delta_mode="error",
+    schema_mode="merge",
+    file_name_column=None,
+    newlines_in_values=False,
+    conversion_errors=None,
+    column_types=None,
+):
+    """Escribe varios archivos CSV en una tabla Delta en una sola transacción, leyéndolos por bloques.
+    csv_files es una lista de tuplas con la ruta de cada archivo y su delimitador.
+    Si se indica la lista conversion_errors, se le añaden los errores de conversión de los bloques de filas.
+    column_types es un diccionario opcional con el tipo de algunas columnas, por su nombre. Los tipos de las demás se infieren.
+    """
+    import pyarrow as pa
+    from deltalake import write_deltalake
+    from rich.progress import Progress
+
+    if conversion_errors is None:
+        conversion_errors = []
+
+    # Buscando el esquema de cada archivo para unirlos en el esquema de la tabla Delta.
+    # Los tipos de las columnas de los archivos anteriores se reutilizan, por lo que solo se infieren los de las columnas nuevas
+    # y una misma columna tiene el mismo tipo en todos los archivos.
+    column_types = dict(column_types or {})
+    csv_schemas = []
+    for csv_file, delimiter in csv_files:
+        csv_schema = get_csv_schema(
+            csv_file, delimiter, column_types, newlines_in_values
+        )
+        column_types = {**get_column_types(csv_schema), **column_types}
+        csv_schemas.append(csv_schema)
+
+    schema = pa.unify_schemas(csv_schemas)
+    if file_name_column is not None:
+        schema = schema.append(pa.field(file_name_column, pa.string()))
+
+    # En lugar de imprimir una línea por archivo, se actualiza una barra de progreso en la misma línea de la consola
+    with Progress() as progress:
+        progress_task = progress.add_task("Convirtiendo", total=len(csv_files))
+
+        batches = read_csv_files_batches(
+            csv_files,
+            schema,
+            column_types,
+            file_name_column,
+            newlines_in_values,
+            progress,
+            progress_task,
+        )
+        reader = pa.RecordBatchReader.from_batches(
+            schema, record_conversion_errors(batches, conversion_errors)
+        )
+        write_deltalake(
+            delta_folder,
+            reader,
+            mode=delta_mode,
+            schema_mode=schema_mode,
+            engine="rust",
+        )
+
+
+def get_csv_files_column_types(csv_files, newlines_in_values=False):
+    """Devuelve un diccionario con el tipo de cada columna de varios archivos CSV, por su nombre, leyendo cada archivo completo.
+    csv_files es una lista de tuplas con la ruta de cada archivo y su delimitador.
+    Al leer el archivo completo, pyarrow ajusta el tipo de las columnas que tienen valores de otro tipo después del primer bloque.
+    Si una columna tiene tipos distintos en varios archivos, se utiliza un tipo que admita todos los valores, por ejemplo,
+    decimal para enteros y decimales, o texto si no hay ninguno.
+    Los archivos se leen uno tras otro, por lo que solo hay uno en memoria cada vez.
+    """
+    import pyarrow as pa
+
+    fields_by_name = {}
+    for csv_file, delimiter in csv_files:
+        schema = csv_utils.read_csv(csv_file, delimiter, newlines_in_values).schema
+        for field in schema:
+            fields_by_name.setdefault(field.name, []).append(field)
+
+    column_types = {}
+    for name, fields in fields_by_name.items():
+        try:
+            column_types[name] = (
+                pa.unify_schemas(
+                    [pa.schema([field]) for field in fields],
+                    promote_options="permissive",
+                )
+                .field(name)
+                .type
+            )
+        except pa.ArrowTypeError:
+            column_types[name] = pa.string()
+
+    return column_types
+
+
+def record_conversion_errors(batches, conversion_errors):
+    """Generador que devuelve los mismos bloques de filas que batches.
+    Si al leer un bloque pyarrow lanza ArrowInvalid, por ejemplo, porque un valor no cabe en el tipo de su columna,
+    añade el error a la lista conversion_errors antes de volver a lanzarlo.
+    Así se puede saber que ese fue el error aunque deltalake lo envuelva en otra excepción.
+    """
+    import pyarrow as pa
+
+    try:
+        yield from batches
+    except pa.ArrowInvalid as ex:
+        conversion_errors.append(ex)
+        raise
+
+
+def get_csv_schema(
+    csv_file, csv_delimiter, column_types=None, newlines_in_values=False
+):
+    """Devuelve el esquema de un archivo CSV.
+    Los tipos de las columnas que no están en column_types se infieren a partir del primer bloque del archivo.
+    """
+    with csv_utils.open_csv(
+        csv_file, csv_delimiter, column_types, newlines_in_values
+    ) as reader:
+        return reader.schema
+
+
+def get_column_types(schema):
+    """Devuelve un diccionario con el tipo de cada columna de un esquema de Arrow, por su nombre."""
+    return {field.name: field.type for field in schema}
+
+
+def read_csv_files_batches(
+    csv_files,
+    schema,
+    column_types,
+    file_name_column=None,
+    newlines_in_values=False,
+    progress=None,
+    progress_task=None,
+):
+    """Generador que devuelve, uno tras otro, los bloques de filas de varios archivos CSV.
+    csv_files es una lista de tuplas con la ruta de cada archivo y su delimitador.
+    Los archivos se leen con los tipos de column_types, que ya se conocen, por lo que no se vuelven a inferir.
+    Los bloques se devuelven con las columnas de schema. Las columnas que no tiene un archivo se rellenan con valores nulos.
+    Si se indica file_name_column, a cada bloque se le añade una columna con el nombre del archivo, sin la extensión.
+    Mientras se devuelven los bloques de un archivo, en otro hilo se abre el siguiente archivo, que lee y convierte su primer bloque.
+    Si se indica una barra de progreso de Rich, se avanza una posición en la tarea progress_task por cada archivo leído.
+    """
+    import pyarrow as pa
+
+    def open_csv_file(index):
+        csv_file, csv_delimiter = csv_files[index]
+        return csv_utils.open_csv(
+            csv_file, csv_delimiter, column_types, newlines_in_values
+        )
+
+    if not csv_files:
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_reader = executor.submit(open_csv_file, 0)
+
+        for index, (csv_file, _) in enumerate(csv_files):
+            if progress is not None:
+                progress.update(progress_task, description=Path(csv_file).name)
+
+            reader = next_reader.result()
+            if index + 1 < len(csv_files):
+                next_reader = executor.submit(open_csv_file, index + 1)
+
+            file_name = Path(csv_file).stem
+            with reader:
+                for batch in reader:
+                    if batch.schema.equals(schema):
+                        yield batch
+                        continue
+
+                    batch_columns = dict(zip(batch.schema.names, batch.columns))
+                    if file_name_column is not None:
+                        batch_columns[file_name_column] = pa.array(
+                            [file_name] * batch.num_rows, type=pa.string()
+                        )
+
+                    yield pa.RecordBatch.from_arrays(
+                        [
+                            (
+                                batch_columns[field.name]
+                                if field.name in batch_columns
+                                else pa.nulls(batch.num_rows, type=field.type)
+                            )
+                            for field in schema
+                        ],
+                        schema=schema,
+                    )
+
+            if progress is not None:
+                progress.advance(progress_task)
+
+
+def detect_csv_delimiter(csv_file):
+    """Trata de detectar el delimitador de celdas de un archivo CSV leyendo su primera línea.
+    Si no lo consigue, lanza la excepción CsvDelimiterNotDetected.
+    """
+    try:
+        csv_delimiter = csv_utils.detect_csv_delimiter(csv_file)
+    except OSError:
+        csv_delimiter = None
+
+    if csv_delimiter is None:
+        raise CsvDelimiterNotDetected(
+            f"no se pudo detectar el deimitador de celdas del archivo csv: {csv_file}"
+        )
+
+    return csv_delimiter
+
+
 def convert_json_to_delta(
     json_file,
     delta_folder,
@@ -68,30 +374,54 @@ def convert_json_to_delta(
     schema_mode="merge",
     file_name_column=None,
 ):
-    json_file_path = Path(json_file)
-    try:
-        json_text = json_file_path.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        json_text = json_file_path.read_text()
+    import pyarrow as pa
+    from deltalake import write_deltalake
 
-    data = json.loads(json_text)
-    df = pd.json_normalize(data)
+    # El JSON se convierte directamente a una tabla de Arrow, sin pasar por un DataFrame de pandas
+    t = json_utils.read_json_to_table(json_file)
 
-    # Añadiendo una fila con el nombre del archivo, sin la extensión.
+    # Añadiendo una columna con el nombre del archivo, sin la extensión.
     if file_name_column is not None:
         file_name = Path(json_file).stem
-        df[file_name_column] = file_name
-
-    # Si alguna columna esta vacía, el tipo de datos será Null que no es compatible con Delta
-    # por tanto se buscan dichas columnas y se le cambia el tipo de dato a string.
-    cols_with_all_nulls = df.columns[df.isnull().all()]
-    df[cols_with_all_nulls] = df[cols_with_all_nulls].astype("string")
+        new_column = pa.array([file_name] * len(t), type=pa.string())
+        t = t.append_column(file_name_column, new_column)
 
     write_deltalake(
-        delta_folder, df, mode=delta_mode, schema_mode=schema_mode, engine="rust"
+        delta_folder, t, mode=delta_mode, schema_mode=schema_mode, engine="rust"
     )
 
 
+def convert_json_files_to_delta(
+    json_files,
+    delta_folder,
+    delta_mode="error",
+    schema_mode="merge",
+    file_name_column=None,
+):
+    """Convierte varios archivos JSON a una tabla Delta, uno tras otro.
+    Si hay más de un archivo, se muestra una barra de progreso.
+    """
+    from rich.progress import Progress
+
+    with Progress(disable=len(json_files) < 2) as progress:
+        progress_task = progress.add_task("Convirtiendo", total=len(json_files))
+
+        for json_file in json_files:
+            progress.update(progress_task, description=Path(json_file).name)
+
+            convert_json_to_delta(
+                json_file, delta_folder, delta_mode, schema_mode, file_name_column
+            )
+            progress.advance(progress_task)
+
+            # Se fuerza el modo "append" a partir del segundo archivo, sin importar cual fue el modo escogido por el usuario.
+            # Si el modo era "error" y la tabla ya existía, ya dió el error con el primer archivo.
+            # Si el modo era "overwrite", ya el primer archivo sobrescribió la tabla Delta
+            delta_mode = "append"
+            # También se fuerza a que se pueda cambiar el esquema a partir del segun archivo
+            schema_mode = "merge"
+
+
 def print_error(error_message):
     Console().print(
         Panel(error_message, title="Error", title_align="left", border_style="red")
@@ -168,6 +498,14 @@ def todelta_command(
             show_default=False,
         ),
     ] = None,
+    embedded_newlines: Annotated[
+        bool,
+        typer.Option(
+            "--embeddednewlines",
+            "-en",
+            help="Indica que algunas celdas del archivo CSV, entre comillas, contienen saltos de línea. La lectura es más lenta, por lo que solo se debe indicar si hace falta.",
+        ),
+    ] = False,
 ):
     """Convierte archivos CSV o JSON a una tabla Delta.
     Puede convertir un solo archivo o todos los archivos de una carpeta que cumplan con un patrón.
@@ -190,122 +528,67 @@ def todelta_command(
             input_pattern = "*.json"
 
     if input.is_file():
-
+        input_files = [input]
         print(f"Archivo origen: {input}")
-        print(f"Carpeta destino: {output}")
-
-        if delta_mode != "error":
-            print(f"Modo de escritura en la tabla Delta: {delta_mode}")
-
-        if file_name_column is not None:
-            print(
-                f"Se agregará la columna {file_name_column} con el nombre de cada archivo origen, sin la extensión."
-            )
-
-        print()
-
-        try:
-            if input_format == InputFormat.csv:
-                convert_csv_to_delta(
-                    input, output, delta_mode, schema_mode, delimiter, file_name_column
-                )
-            else:
-                convert_json_to_delta(
-                    input, output, delta_mode, schema_mode, file_name_column
-                )
-
-        except CsvDelimiterNotDetected:
-            print_error(
-                f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
-            )
-            sys.exit(4)
-
-        except FileExistsError:
-            print_error(
-                f"La tabla Delta ya existe y no se ha indicado ningún modo con el parámetro -dm."
-            )
-            sys.exit(5)
-
-        except Exception as ex:
-            print_error(
-                "Ocurrió un error leyendo el archivo de origen o escribiendo hacia la tabla Delta."
-                + "\n\nCompruebe que el origen es un arhivo CSV o JSON y que tiene permisos para crear o sobrescribir en la carpeta de destino."
-                + "\nSi la tabla Delta ya existía, utiliza el parámetro -dm para indicar si quiere sobrescribir o anexar los nuevos datos."
-                + "\n\nA continuación puedes ver el mensaje de error original:"
-                + f"\n\n{ex}"
-            )
-            sys.exit(2)
 
     elif input.is_dir():
-
+        input_files = list(find_files(input, input_pattern))
         print(f"Carpeta origen: {input}")
         print(f"Patrón: {input_pattern}")
-        print(f"Carpeta destino: {output}")
-
-        if delta_mode != "error":
-            print(f"Modo de escritura en la tabla Delta: {delta_mode}")
-
-        if file_name_column is not None:
-            print(
-                f"Se agregará la columna {file_name_column} con el nombre de cada archivo origen, sin la extensión."
-            )
 
-        print()
+    else:
+        print_error(
+            f'El origen "{input}" no es válido. Tiene que ser la ruta a un archivo CSV o JSON o a una carpeta que existan.'
+        )
+        sys.exit(3)
 
-        is_first_file = True
-        for input_file in Path(input).glob(input_pattern):
-            print(f"Procesando el archivo de origen: {input_file}")
+    print(f"Carpeta destino: {output}")
 
-            if not is_first_file:
-                # Se fuerza el modo "append" a partir del segundo archivo de la carpeta, sin importar cual fue el modo escogido por el usuario.
-                # Si el modo era "error" y la tabla ya existía, ya dió el error con el primer archivo.
-                # Si el modo era "overwrite", ya el primer archivo sobrescribió la tabla Delta
-                delta_mode = "append"
-                # También se fuerza a que se pueda cambiar el esquema a partir del segun archivo
-                schema_mode = "merge"
+    if delta_mode != "error":
+        print(f"Modo de escritura en la tabla Delta: {delta_mode}")
 
-            is_first_file = False
+    if file_name_column is not None:
+        print(
+            f"Se agregará la columna {file_name_column} con el nombre de cada archivo origen, sin la extensión."
+        )
 
-            try:
+    print()
 
-                if input_format == InputFormat.csv:
-                    convert_csv_to_delta(
-                        input_file,
-                        output,
-                        delta_mode,
-                        schema_mode,
-                        delimiter,
-                        file_name_column,
-                    )
-                else:
-                    convert_json_to_delta(
-                        input_file, output, delta_mode, schema_mode, file_name_column
-                    )
+    # Un archivo se convierte igual que una carpeta con un solo archivo, por lo que los errores se tratan en un único lugar
+    try:
+        if input_format == InputFormat.csv:
+            convert_csv_files_to_delta(
+                input_files,
+                output,
+                delta_mode,
+                schema_mode,
+                delimiter,
+                file_name_column,
+                embedded_newlines,
+            )
+        else:
+            convert_json_files_to_delta(
+                input_files, output, delta_mode, schema_mode, file_name_column
+            )
 
-            except CsvDelimiterNotDetected:
-                print_error(
-                    f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
-                )
-                sys.exit(4)
+    except CsvDelimiterNotDetected:
+        print_error(
+            f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
+        )
+        sys.exit(4)
 
-            except FileExistsError:
-                print_error(
-                    f"La tabla Delta ya existe y no se ha indicado ningún modo con el parámetro -dm."
-                )
-                sys.exit(5)
-
-            except Exception as ex:
-                print_error(
-                    "Ocurrió un error leyendo el archivo de origen o escribiendo hacia la tabla Delta."
-                    + "\n\nCompruebe que el origen es un arhivo CSV o JSON y que tiene permisos para crear o sobrescribir en la carpeta de destino."
-                    + "\nSi la tabla Delta ya existía, utiliza el parámetro -dm para indicar si quiere sobrescribir o anexar los nuevos datos."
-                    + "\n\nA continuación puedes ver el mensaje de error original:"
-                    + f"\n\n{ex}"
-                )
-                sys.exit(2)
+    except FileExistsError:
+        print_error(
+            f"La tabla Delta ya existe y no se ha indicado ningún modo con el parámetro -dm."
+        )
+        sys.exit(5)
 
-    else:
+    except Exception as ex:
         print_error(
-            f'El origen "{input}" no es válido. Tiene que ser la ruta a un archivo CSV o JSON o a una carpeta que existan.'
+            "Ocurrió un error leyendo el archivo de origen o escribiendo hacia la tabla Delta."
+            + "\n\nCompruebe que el origen es un arhivo CSV o JSON y que tiene permisos para crear o sobrescribir en la carpeta de destino."
+            + "\nSi la tabla Delta ya existía, utiliza el parámetro -dm para indicar si quiere sobrescribir o anexar los nuevos datos."
+            + "\n\nA continuación puedes ver el mensaje de error original:"
+            + f"\n\n{ex}"
         )
-        sys.exit(3)
+        sys.exit(2)
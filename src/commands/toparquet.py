@@ -1,59 +1,150 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import csv
-import json
 from enum import StrEnum
 
 import typer
 from typing_extensions import Annotated
-from pyarrow import csv as pacsv, parquet
-import pandas as pd
 from rich.console import Console
 from rich.panel import Panel
 
+import utils.csv_utils as csv_utils
+from utils.csv_utils import open_csv
+from utils.json_utils import read_json_to_table
+from utils.path_utils import find_files
+
+# Número de archivos de una carpeta que se convierten a la vez
+CONVERSION_MAX_WORKERS = 4
+
 
 class InputFormat(StrEnum):
     csv = "csv"
     json = "json"
 
 
+class ParquetCompression(StrEnum):
+    zstd = "zstd"
+    snappy = "snappy"
+    gzip = "gzip"
+    none = "none"
+
+
 class CsvDelimiterNotDetected(Exception):
     pass
 
 
-def convert_csv_to_parquet(csv_file, parquet_file, delimiter):
+def convert_csv_to_parquet(
+    csv_file, parquet_file, delimiter, compression="zstd", newlines_in_values=False
+):
     if delimiter is None:
-        try:
-            with open(csv_file, newline="") as csvfile:
-                dialect = csv.Sniffer().sniff(csvfile.read(10_000))
-                delimiter = dialect.delimiter
-        except:
-            raise CsvDelimiterNotDetected(
-                f"no se pudo detectar el deimitador de celdas del archivo csv: {csv_file}"
-            )
+        delimiter = detect_csv_delimiter(csv_file)
 
-    parse_options = pacsv.ParseOptions(delimiter=delimiter)
+    import pyarrow as pa
+    from pyarrow import parquet
 
-    t = pacsv.read_csv(csv_file, parse_options=parse_options)
-    parquet.write_table(t, parquet_file)
+    # El archivo se lee por bloques de filas y cada bloque se escribe en el Parquet como un grupo de filas,
+    # sin cargar el archivo completo en memoria
+    try:
+        with open_csv(
+            csv_file, delimiter, newlines_in_values=newlines_in_values
+        ) as reader:
+            with parquet.ParquetWriter(
+                parquet_file, reader.schema, compression=compression
+            ) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        return
+    except pa.ArrowInvalid:
+        # Los tipos de las columnas se infieren con el primer bloque y puede que un bloque posterior tenga valores de otro tipo.
+        # Se borra el Parquet a medio escribir y se vuelve a convertir el archivo leyéndolo completo, para que pyarrow ajuste los tipos.
+        Path(parquet_file).unlink(missing_ok=True)
+
+    table = csv_utils.read_csv(csv_file, delimiter, newlines_in_values)
+    parquet.write_table(table, parquet_file, compression=compression)
+
+
+def detect_csv_delimiter(csv_file):
+    """Trata de detectar el delimitador de celdas de un archivo CSV leyendo su primera línea.
+    Si no lo consigue, lanza la excepción CsvDelimiterNotDetected.
+    """
+    try:
+        delimiter = csv_utils.detect_csv_delimiter(csv_file)
+    except OSError:
+        delimiter = None
 
+    if delimiter is None:
+        raise CsvDelimiterNotDetected(
+            f"no se pudo detectar el deimitador de celdas del archivo csv: {csv_file}"
+        )
 
-def convert_json_to_parquet(json_file, parquet_file):
-    json_file_path = Path(json_file)
-    try:
-        json_text = json_file_path.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        json_text = json_file_path.read_text()
+    return delimiter
 
-    data = json.loads(json_text)
-    df = pd.json_normalize(data)
 
-    # Si alguna columna esta vacía, el tipo de datos será Null que puede no ser compatible con parquet
-    # por tanto se buscan dichas columnas y se le cambia el tipo de dato a string.
-    cols_with_all_nulls = df.columns[df.isnull().all()]
-    df[cols_with_all_nulls] = df[cols_with_all_nulls].astype("string")
+def convert_json_to_parquet(json_file, parquet_file, compression="zstd"):
+    from pyarrow import parquet
 
-    df.to_parquet(parquet_file)
+    # El JSON se convierte directamente a una tabla de Arrow, sin pasar por un DataFrame de pandas
+    t = read_json_to_table(json_file)
+    parquet.write_table(t, parquet_file, compression=compression)
+
+
+def convert_files_to_parquet(
+    input_files,
+    output_files,
+    input_format=InputFormat.csv,
+    delimiter=None,
+    compression="zstd",
+    newlines_in_values=False,
+):
+    """Convierte varios archivos CSV o JSON a Parquet, cada uno en el archivo de destino que ocupa la misma posición en output_files.
+    Si hay más de un archivo, se muestra una barra de progreso.
+    """
+    from rich.progress import Progress
+
+    # Se detectan los delimitadores de todos los archivos CSV antes de empezar a convertirlos,
+    # para que si falla alguno no se quede la carpeta a medio convertir
+    input_delimiters = [delimiter] * len(input_files)
+    if input_format == InputFormat.csv and delimiter is None:
+        input_delimiters = [
+            detect_csv_delimiter(input_file) for input_file in input_files
+        ]
+
+    # Cada archivo se convierte de forma independiente, por lo que se convierten varios a la vez.
+    # pyarrow libera el GIL mientras lee el CSV y escribe el Parquet, así que los hilos trabajan en paralelo.
+    with ThreadPoolExecutor(max_workers=CONVERSION_MAX_WORKERS) as executor:
+        futures = []
+        for input_file, output_file, input_delimiter in zip(
+            input_files, output_files, input_delimiters
+        ):
+            if input_format == InputFormat.csv:
+                futures.append(
+                    executor.submit(
+                        convert_csv_to_parquet,
+                        input_file,
+                        output_file,
+                        input_delimiter,
+                        compression,
+                        newlines_in_values,
+                    )
+                )
+            else:
+                futures.append(
+                    executor.submit(
+                        convert_json_to_parquet,
+                        input_file,
+                        output_file,
+                        compression,
+                    )
+                )
+
+        # En lugar de imprimir una línea por archivo, se actualiza una barra de progreso en la misma línea de la consola
+        with Progress(disable=len(input_files) < 2) as progress:
+            progress_task = progress.add_task("Convirtiendo", total=len(input_files))
+
+            for input_file, future in zip(input_files, futures):
+                progress.update(progress_task, description=input_file.name)
+                future.result()
+                progress.advance(progress_task)
 
 
 def print_error(error_message):
@@ -115,6 +206,23 @@ def toparquet_command(
             show_default=False,
         ),
     ] = None,
+    compression: Annotated[
+        ParquetCompression,
+        typer.Option(
+            "--compression",
+            "-c",
+            help="Compresión de los archivos Parquet. zstd genera archivos más pequeños que snappy con una velocidad de lectura parecida.",
+            case_sensitive=False,
+        ),
+    ] = ParquetCompression.zstd,
+    embedded_newlines: Annotated[
+        bool,
+        typer.Option(
+            "--embeddednewlines",
+            "-en",
+            help="Indica que algunas celdas del archivo CSV, entre comillas, contienen saltos de línea. La lectura es más lenta, por lo que solo se debe indicar si hace falta.",
+        ),
+    ] = False,
 ):
     """Convierte archivos CSV o JSON a Parquet.
     Puede convertir un solo archivo o todos los archivos de una carpeta que cumplan con un patrón.
@@ -142,23 +250,8 @@ def toparquet_command(
         print(f"Archivo origen: {input}")
         print(f"Archivo destino: {output_file}")
 
-        try:
-            if input_format == InputFormat.csv:
-                convert_csv_to_parquet(input, output_file, delimiter)
-            else:
-                convert_json_to_parquet(input, output_file)
-
-        except CsvDelimiterNotDetected:
-            print_error(
-                f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
-            )
-            sys.exit(4)
-
-        except:
-            print_error(
-                "Ocurrió un error leyendo el archivo de origen o escribiendo hacia el archivo de destino. Compruebe que el origen es un arhico CSV o JSON y que tiene permisos para crear o sobrescribir el archico de destino."
-            )
-            sys.exit(2)
+        input_files = [input]
+        output_files = [output_file]
 
     elif input.is_dir():
 
@@ -174,27 +267,39 @@ def toparquet_command(
         print(f"Carpeta origen: {input}")
         print(f"Patrón: {input_pattern}")
         print(f"Carpeta destino: {output}")
+        print()
 
-        for input_file in Path(input).glob(input_pattern):
-            output_file = output / input_file.with_suffix(".parquet").name
-            print()
-            print(f"Archivo origen: {input_file}")
-            print(f"Archivo destino: {output_file}")
-
-            try:
-                if input_format == InputFormat.csv:
-                    convert_csv_to_parquet(input_file, output_file, delimiter)
-                else:
-                    convert_json_to_parquet(input_file, output_file)
-
-            except CsvDelimiterNotDetected:
-                print_error(
-                    f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
-                )
-                sys.exit(4)
+        input_files = list(find_files(input, input_pattern))
+        output_files = [
+            output / input_file.with_suffix(".parquet").name
+            for input_file in input_files
+        ]
 
     else:
         print_error(
             f'El origen "{output}" no es válido. Tiene que ser la ruta a un archivo CSV o a una carpeta que existan.'
         )
         sys.exit(3)
+
+    # Un archivo se convierte igual que una carpeta con un solo archivo, por lo que los errores se tratan en un único lugar
+    try:
+        convert_files_to_parquet(
+            input_files,
+            output_files,
+            input_format,
+            delimiter,
+            compression,
+            embedded_newlines,
+        )
+
+    except CsvDelimiterNotDetected:
+        print_error(
+            f"No se pudo detectar el delimitador de celdas del archivo CSV. Compruebe que el archivo es un CSV, y si lo es, indique un delimitador con el parámetro -d."
+        )
+        sys.exit(4)
+
+    except Exception:
+        print_error(
+            "Ocurrió un error leyendo el archivo de origen o escribiendo hacia el archivo de destino. Compruebe que el origen es un arhico CSV o JSON y que tiene permisos para crear o sobrescribir el archico de destino."
+        )
+        sys.exit(2)
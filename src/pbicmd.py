@@ -6,6 +6,8 @@ Se distribuye como un ejecutable EXE para Windows para que pueda ser utilizada s
 Ejecutando el script o el ejecutable sin parámetros, muestra la ayuda con los comandos disponibles.
 
 Los comandos están definidos en ficheros separados en la subcarpeta commands.
+Las librerías más pesadas, como pandas, pyarrow o deltalake, se importan dentro de las funciones que las usan,
+para que pbicmd arranque rápido, por ejemplo, al mostrar la ayuda o al ejecutar un comando que no las necesita.
 
 """
 
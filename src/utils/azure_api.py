@@ -1,12 +1,116 @@
-from azure.identity import DefaultAzureCredential
+import json
+import os
+import threading
+import time
+from functools import cache
+from pathlib import Path
 
 AZURE_MANAGEMENT_SCOPE = "https://management.azure.com/.default"
 
+# Fichero donde se guardan los tokens entre distintas ejecuciones de pbicmd
+TOKEN_CACHE_FILE = Path.home() / ".pbicmd" / "token_cache.json"
+# Un token guardado solo se reutiliza si le quedan al menos estos segundos de validez
+TOKEN_CACHE_MIN_SECONDS_LEFT = 300
+
+# Tokens ya obtenidos durante esta ejecución, por scope, para no volver a leer el fichero de caché
+access_tokens_in_memory = {}
+# Evita que varios hilos pidan a la vez un token para el mismo scope, por ejemplo abriendo dos veces el navegador
+access_tokens_lock = threading.Lock()
+
 
 def get_access_token(scope: str) -> str:
     """Se conecta a la API de Azure para pedir un token que autorice el acceso a un scope
     Retorna una cadena de texto con el token.
+    Los tokens se guardan en un fichero por cada scope y se reutilizan mientras sigan siendo válidos,
+    para no tener que autenticarse de nuevo en cada ejecución.
+    Dentro de una misma ejecución, los tokens también se guardan en memoria.
+    """
+    with access_tokens_lock:
+        cached_token = access_tokens_in_memory.get(scope)
+        if is_token_valid(cached_token):
+            return cached_token["token"]
+
+        token_cache_key = get_token_cache_key(scope)
+        token_cache = read_token_cache()
+        cached_token = token_cache.get(token_cache_key)
+        if is_token_valid(cached_token):
+            access_tokens_in_memory[scope] = cached_token
+            return cached_token["token"]
+
+        access_token = get_azure_credential().get_token(scope)
+
+        token_cache[token_cache_key] = {
+            "token": access_token.token,
+            "expires_on": access_token.expires_on,
+        }
+        write_token_cache(token_cache)
+        access_tokens_in_memory[scope] = token_cache[token_cache_key]
+
+        return access_token.token
+
+
+@cache
+def get_azure_credential():
+    """Devuelve la credencial de Azure compartida por todos los scopes.
+    Así, si hay que autenticarse de forma interactiva para un scope, la autenticación se reutiliza para los demás.
+    """
+    # azure.identity tarda en importarse, por lo que solo se importa si no hay un token válido en la caché
+    from azure.identity import DefaultAzureCredential
+
+    return DefaultAzureCredential(exclude_interactive_browser_credential=False)
+
+
+def get_token_cache_key(scope: str) -> str:
+    """Devuelve la clave con la que se guarda en el fichero de caché el token de un scope.
+    La clave incluye el tenant y el ID de cliente de las variables del entorno AZURE_TENANT_ID y AZURE_CLIENT_ID,
+    para que al cambiar de entidad de servicio no se reutilice el token de la anterior.
+    """
+    tenant_id = os.environ.get("AZURE_TENANT_ID", "")
+    client_id = os.environ.get("AZURE_CLIENT_ID", "")
+    if not tenant_id and not client_id:
+        return scope
+
+    return f"{scope}|{tenant_id}|{client_id}"
+
+
+def is_token_valid(cached_token: dict | None) -> bool:
+    """Indica si un token guardado existe y le queda suficiente tiempo de validez para seguir usándolo."""
+    return (
+        cached_token is not None
+        and cached_token["expires_on"] > time.time() + TOKEN_CACHE_MIN_SECONDS_LEFT
+    )
+
+
+def read_token_cache() -> dict:
+    """Lee los tokens guardados en el fichero de caché.
+    Si el fichero no existe o no se puede leer, retorna un diccionario vacío.
+    Solo se devuelven los tokens que tienen el formato esperado, los demás se ignoran.
+    """
+    try:
+        token_cache = json.loads(TOKEN_CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(token_cache, dict):
+        return {}
+
+    return {
+        key: cached_token
+        for key, cached_token in token_cache.items()
+        if isinstance(cached_token, dict)
+        and isinstance(cached_token.get("token"), str)
+        and isinstance(cached_token.get("expires_on"), (int, float))
+    }
+
+
+def write_token_cache(token_cache: dict) -> None:
+    """Guarda los tokens en el fichero de caché, con permisos de lectura y escritura solo para el usuario.
+    Si no se puede escribir el fichero, se ignora el error porque la caché es opcional.
     """
-    credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-    access_token = credential.get_token(scope)
-    return access_token.token
+    try:
+        TOKEN_CACHE_FILE.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(TOKEN_CACHE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, mode="w", encoding="utf-8") as f:
+            json.dump(token_cache, f)
+    except OSError:
+        pass
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+
+# Delimitadores de celdas que se buscan en los archivos CSV, por orden de preferencia en caso de empate
+CSV_DELIMITERS = b",;\t|"
+# Bytes que se leen del principio del archivo CSV para buscar la primera línea
+CSV_SAMPLE_SIZE = 65_536
+# Tamaño en bytes de los bloques en que se leen los archivos CSV.
+# Con bloques grandes, los tipos de las columnas se infieren con más filas y los archivos Parquet tienen grupos de filas más grandes.
+CSV_READ_BLOCK_SIZE = 64 << 20
+# Extensiones de los archivos CSV comprimidos, que pyarrow descomprime al abrirlos por la ruta
+CSV_COMPRESSED_SUFFIXES = {".gz", ".bz2", ".lz4", ".zst"}
+
+
+def detect_csv_delimiter(csv_file: str | Path) -> str | None:
+    """Trata de detectar el delimitador de celdas de un archivo CSV.
+    Cuenta cuántas veces aparece cada delimitador posible en la primera línea del archivo y devuelve el que más aparece.
+    La primera línea se lee como bytes, por lo que no hace falta conocer la codificación del archivo.
+    Los archivos comprimidos se descomprimen según su extensión, igual que al leerlos con open_csv.
+    No se cuentan los caracteres que están entre comillas dobles, que son parte del valor de una celda.
+    Si no aparece ninguno de los delimitadores, devuelve None.
+    """
+    if Path(csv_file).suffix.lower() in CSV_COMPRESSED_SUFFIXES:
+        import pyarrow as pa
+
+        with pa.input_stream(str(csv_file), compression="detect") as f:
+            sample = f.read(CSV_SAMPLE_SIZE)
+    else:
+        with open(csv_file, mode="rb") as f:
+            sample = f.read(CSV_SAMPLE_SIZE)
+
+    first_line = sample.split(b"\n", 1)[0]
+
+    # Al separar por las comillas, los trozos en posición par quedan fuera de las comillas.
+    # Las comillas escapadas dentro de un valor ("") dejan un trozo vacío, por lo que no cambian qué trozos quedan fuera.
+    unquoted = b"".join(first_line.split(b'"')[::2])
+
+    counts = {delimiter: unquoted.count(delimiter) for delimiter in CSV_DELIMITERS}
+    delimiter = max(counts, key=counts.get)
+    if counts[delimiter] == 0:
+        return None
+
+    return chr(delimiter)
+
+
+def open_csv(
+    csv_file: str | Path,
+    delimiter: str,
+    column_types: dict | None = None,
+    newlines_in_values: bool = False,
+) -> pacsv.CSVStreamingReader:
+    """Abre un archivo CSV para leerlo por bloques de filas, sin cargarlo completo en memoria.
+    column_types es un diccionario opcional con el tipo de Arrow de algunas columnas, por su nombre.
+    Los tipos de las demás columnas se infieren a partir del primer bloque.
+    Si newlines_in_values es False, pyarrow divide el archivo en bloques buscando solo los saltos de línea, que es mucho más rápido,
+    pero no admite celdas con saltos de línea.
+    Los tipos de las columnas quedan fijados por el primer bloque, por lo que si en un bloque posterior aparece un valor
+    que no cabe en el tipo de su columna, por ejemplo, un decimal en una columna de enteros, la lectura de ese bloque lanza ArrowInvalid.
+    En ese caso, el archivo se puede leer completo con read_csv.
+    """
+    from pyarrow import csv as pacsv
+
+    return pacsv.open_csv(
+        open_csv_source(csv_file),
+        # Se indica explícitamente que pyarrow utilice su grupo de hilos para leer y convertir los bloques
+        read_options=pacsv.ReadOptions(
+            use_threads=True, block_size=CSV_READ_BLOCK_SIZE
+        ),
+        parse_options=pacsv.ParseOptions(
+            delimiter=delimiter, newlines_in_values=newlines_in_values
+        ),
+        convert_options=pacsv.ConvertOptions(column_types=column_types),
+    )
+
+
+def read_csv(
+    csv_file: str | Path, delimiter: str, newlines_in_values: bool = False
+) -> pa.Table:
+    """Lee un archivo CSV completo a una tabla de Arrow.
+    A diferencia de open_csv, si en un bloque posterior al primero aparece un valor que no cabe en el tipo inferido para su columna,
+    pyarrow cambia el tipo de la columna, por ejemplo, de entero a decimal o a texto, en lugar de lanzar un error.
+    A cambio, el archivo se carga completo en memoria.
+    """
+    from pyarrow import csv as pacsv
+
+    return pacsv.read_csv(
+        open_csv_source(csv_file),
+        read_options=pacsv.ReadOptions(
+            use_threads=True, block_size=CSV_READ_BLOCK_SIZE
+        ),
+        parse_options=pacsv.ParseOptions(
+            delimiter=delimiter, newlines_in_values=newlines_in_values
+        ),
+    )
+
+
+def open_csv_source(csv_file: str | Path):
+    """Devuelve el origen desde el que pyarrow lee un archivo CSV.
+    Los archivos sin comprimir se abren como memory map, para que pyarrow lea los bloques de la caché de páginas del sistema operativo sin copiarlos.
+    Los archivos comprimidos se pasan por la ruta, para que pyarrow los descomprima según su extensión.
+    """
+    import pyarrow as pa
+
+    if Path(csv_file).suffix.lower() in CSV_COMPRESSED_SUFFIXES:
+        return csv_file
+
+    return pa.memory_map(str(csv_file), "r")
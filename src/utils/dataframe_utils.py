@@ -1,15 +1,20 @@
-import pandas as pd
-from rich.table import Table
-from rich.console import Console
-from typing import Callable
+from __future__ import annotations
+
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from rich.table import Table
 
 
 def add_dataframe_rows_to_table(table: Table, df: pd.DataFrame) -> None:
     """Una función auxiliar utilizada por la función que imprime un DataFrame.
     Añade las filas de un DataFrame a una Table de la librería Rich.
     """
-    for _, row in df.iterrows():
-        table.add_row(*list(row))
+    add_row = table.add_row
+    for row in df.itertuples(index=False, name=None):
+        add_row(*row)
 
 
 def print_dataframe(
@@ -19,33 +24,79 @@ def print_dataframe(
     """Imprime en la consola el contenido de un DataFrame utilizando la librería Rich.
     Si el DataFrame tiene más de 10 filas, solo imprime las primeas 5 y las últimas 5 filas.
     """
-    table = Table(show_header=True, header_style="bold")
+    from rich.table import Table
+    from rich.console import Console
 
-    df_print = df.astype("str")
+    table = Table(show_header=True, header_style="bold")
 
-    for column_name in df_print.columns:
+    for column_name in df.columns:
         table.add_column(column_name)
 
-    if df_print.shape[0] <= 10:
-        fx_add_rows(table, df_print)
+    # Solo se convierten a texto las filas que se van a imprimir, no todo el DataFrame
+    if df.shape[0] <= 10:
+        fx_add_rows(table, df.astype("str"))
     else:
-        fx_add_rows(table, df_print.head())
-        table.add_row(*["..."] * df_print.shape[1])
-        fx_add_rows(table, df_print.tail())
+        fx_add_rows(table, df.head().astype("str"))
+        table.add_row(*["..."] * df.shape[1])
+        fx_add_rows(table, df.tail().astype("str"))
 
     console = Console()
     console.print(table)
 
 
 def save_dataframe_to_csv(df: pd.DataFrame, file_path: str, **parameters) -> None:
-    """Guarda el contenido de un DataFrame en un fichero CSV."""
+    """Guarda el contenido de un DataFrame en un fichero CSV.
+    Se escribe con pandas y no con el writer CSV de pyarrow, porque pyarrow pone comillas a todos los textos
+    y escribe de otra forma los booleanos y los números decimales, lo que cambiaría el formato de los ficheros.
+    """
     default_parameters = {"index": False, "sep": ";"}
     parameters = {**default_parameters, **parameters}
     df.to_csv(file_path, **parameters)
 
 
 def save_dataframe_to_parquet(df: pd.DataFrame, file_path: str, **parameters) -> None:
-    """Guarda el contenido de un DataFrame en un fichero Parquet."""
-    default_parameters = {"index": False}
+    """Guarda el contenido de un DataFrame en un fichero Parquet.
+    Por defecto se utiliza pyarrow con compresión Zstandard y codificación por diccionario, que reduce mucho el tamaño de las columnas de texto.
+    Zstandard genera archivos más pequeños que Snappy con una velocidad de lectura y escritura parecida, igual que en el comando toparquet.
+    Si alguna columna mezcla valores de distintos tipos, que Parquet no admite, esa columna se guarda como texto.
+    """
+    import pyarrow as pa
+
+    default_parameters = {
+        "index": False,
+        "engine": "pyarrow",
+        "compression": "zstd",
+        "use_dictionary": True,
+    }
     parameters = {**default_parameters, **parameters}
-    df.to_parquet(file_path, **parameters)
+    try:
+        df.to_parquet(file_path, **parameters)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        convert_mixed_columns_to_string(df).to_parquet(file_path, **parameters)
+
+
+def convert_mixed_columns_to_string(df: pd.DataFrame) -> pd.DataFrame:
+    """Devuelve una copia del DataFrame donde las columnas que Arrow no puede convertir porque mezclan valores de distintos tipos,
+    por ejemplo, números y textos en el resultado de una medida de tipo Variant, se convierten a texto.
+    Los valores nulos se mantienen como nulos.
+    """
+    import pyarrow as pa
+
+    mixed_columns = {}
+    for column_name in df.columns[df.dtypes == object]:
+        column = df[column_name]
+        try:
+            pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mixed_columns[column_name] = column.where(column.isna(), column.astype(str))
+
+    return df.assign(**mixed_columns)
+
+
+def save_table_to_parquet(table: pa.Table, file_path: str) -> None:
+    """Guarda el contenido de una tabla de Arrow en un fichero Parquet, sin pasar por pandas.
+    Utiliza los mismos parámetros por defecto que save_dataframe_to_parquet.
+    """
+    from pyarrow import parquet
+
+    parquet.write_table(table, file_path, compression="zstd", use_dictionary=True)
@@ -1,25 +1,111 @@
+from __future__ import annotations
+
 from pathlib import Path
+import codecs
+import json
+import locale
+from typing import TYPE_CHECKING
+
+from utils.json_utils import read_json_with_text_dates
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
 
 
 def read_dax_query(file_dax: Path) -> str:
     """Lee la consulta DAX desde un fichero.
     Si la consulta DAX tiene caracteres acentuados o con otros signos, por ejemplo, ñ, puede haber conflictos con decodificación.
     No hay una forma 100% segura de conocer la codificación de fun fichero, por lo que primero se asume que el fichero está codificado en UUTF-8
-    y se trata de leer. Si se recibe un error al decodificar, se intenta leer de nuevo el fichero pero con la codificación por defecto del Sistema Operativo.
+    y se trata de decodificar. Si se recibe un error al decodificar, se decodifica con la codificación por defecto del Sistema Operativo.
+    El fichero se lee una sola vez y se decodifican los bytes en memoria.
     """
+    dax_bytes = file_dax.read_bytes()
     try:
-        return file_dax.read_text(encoding="utf-8")
+        return dax_bytes.decode("utf-8")
     except UnicodeDecodeError:
-        return file_dax.read_text()
+        return dax_bytes.decode(locale.getpreferredencoding(False))
 
 
-def load_dax_result_to_dataframe(dax_result) -> pd.DataFrame:
+def load_dax_result_to_dataframe(dax_result: bytes) -> pd.DataFrame:
     """Crea un DataFrame con el contenido de la tabla con la respuesta a la consulta DAX.
+    Recibe el cuerpo de la respuesta de la API sin decodificar.
+    Retorna el DataFrame.
+    """
+    # Primero se intenta leer el JSON directamente con Arrow, que crea los arrays de cada columna sin pasar por objetos de Python.
+    table = load_dax_result_to_table(dax_result)
+    if table is not None:
+        return table.to_pandas()
+
+    return load_dax_rows_to_dataframe(dax_result)
+
+
+def load_dax_rows_to_dataframe(dax_result: bytes) -> pd.DataFrame:
+    """Crea un DataFrame con el contenido de la tabla con la respuesta a la consulta DAX, decodificando el JSON con Python.
+    Se utiliza cuando Arrow no puede leer directamente la respuesta, por lo que no vuelve a intentarlo.
+    Recibe el cuerpo de la respuesta de la API sin decodificar.
     Retorna el DataFrame.
     """
-    rows = dax_result["results"][0]["tables"][0]["rows"]
-    # En el JSON que retorna la API de Power BI, puede ser que no todas las filas tengan las mismas columnas,
-    # y json_normalize se encarga de revisar todo el JSON y crear todas las columnas, llenando con NaN las filas que no tengan alguna columna.
-    return pd.json_normalize(rows)
+    import pandas as pd
+    import pyarrow as pa
+
+    rows = json.loads(dax_result)["results"][0]["tables"][0]["rows"]
+    if not rows:
+        return pd.DataFrame()
+
+    # En el JSON que retorna la API de Power BI, puede ser que no todas las filas tengan las mismas columnas.
+    # Arrow revisa todas las filas y crea todas las columnas, llenando con nulos las filas que no tengan alguna columna,
+    # y construye directamente los arrays de cada columna sin pasar por json_normalize, que es mucho más lento.
+    try:
+        return pa.RecordBatch.from_struct_array(pa.array(rows)).to_pandas()
+    except pa.ArrowException:
+        # Si Arrow no puede inferir el tipo de una columna, por ejemplo, porque mezcla números y textos,
+        # se crea el DataFrame directamente con las filas, que acepta cualquier combinación de tipos.
+        # Los valores de las filas nunca son objetos anidados, por lo que no hace falta json_normalize, que recorre cada fila en Python.
+        return pd.DataFrame(rows)
+
+
+def load_dax_result_to_table(dax_result: bytes) -> pa.Table | None:
+    """Crea una tabla de Arrow con el contenido de la tabla con la respuesta a la consulta DAX, sin pasar por pandas.
+    Recibe el cuerpo de la respuesta de la API sin decodificar.
+    Retorna None si Arrow no puede leer directamente la respuesta.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_batches([read_dax_rows_with_arrow(dax_result)])
+    except pa.ArrowException:
+        return None
+
+
+def read_dax_rows_with_arrow(dax_result: bytes) -> pa.RecordBatch:
+    """Lee las filas de la respuesta a una consulta DAX con el lector JSON de Arrow, en una sola pasada y sin crear objetos de Python.
+    Lanza una excepción de Arrow si no se puede inferir el tipo de alguna columna.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import json as pa_json
+
+    buffer = pa.py_buffer(dax_result)
+    # La API de Power BI incluye el BOM de UTF-8 al inicio de la respuesta
+    if dax_result.startswith(codecs.BOM_UTF8):
+        buffer = buffer.slice(len(codecs.BOM_UTF8))
+
+    # Toda la respuesta es un único objeto JSON, por lo que el bloque de lectura tiene que abarcarla completa.
+    # Las fechas se mantienen como texto en el mismo formato que devuelve la API, igual que si se hubiera leído el JSON con Python.
+    response = read_json_with_text_dates(
+        buffer,
+        pa_json.ReadOptions(block_size=max(buffer.size, 1)),
+        newlines_in_values=True,
+    )
+
+    # Navegando hasta results[0].tables[0].rows
+    results = response.column("results").combine_chunks()
+    tables = pc.list_element(results, 0).field("tables")
+    rows = pc.list_flatten(pc.list_element(tables, 0).field("rows"))
+
+    # Si no hay filas, Arrow no puede inferir las columnas
+    if not pa.types.is_struct(rows.type):
+        return pa.RecordBatch.from_pydict({})
+
+    return pa.RecordBatch.from_struct_array(rows)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from functools import cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+# Respuestas JSON de las llamadas GET que tenían la cabecera ETag, por URL, para no volver a descargarlas si no han cambiado
+etag_responses = {}
+
+
+def create_http_session() -> requests.Session:
+    """Crea una sesión HTTP que mantiene abiertas las conexiones (keep-alive) entre llamadas a la API,
+    para no tener que abrir una nueva conexión TCP + TLS en cada llamada.
+    Reintenta las llamadas cuando el servicio responde que está saturado o no disponible temporalmente.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class ApiRetry(Retry):
+        """Solo reintenta las llamadas que no son GET cuando el servicio responde 429 o 503,
+        porque con esos códigos se sabe que no ha procesado la llamada.
+        Con 502 o 504 la llamada podría haberse procesado y repetirla podría, por ejemplo, crear dos veces un punto de restauración.
+        Por el mismo motivo, tampoco se reintentan si se corta la conexión o se agota el tiempo de espera después de enviarlas.
+        """
+
+        def is_retry(self, method, status_code, has_retry_after=False):
+            if method.upper() != "GET" and status_code not in (429, 503):
+                return False
+            return super().is_retry(method, status_code, has_retry_after)
+
+        def increment(
+            self, method=None, url=None, response=None, error=None, *args, **kwargs
+        ):
+            if (
+                error is not None
+                and method is not None
+                and method.upper() != "GET"
+                and self._is_read_error(error)
+            ):
+                raise error
+            return super().increment(method, url, response, error, *args, **kwargs)
+
+    retry = ApiRetry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=["GET", "POST", "PATCH", "DELETE"],
+        # Si el servicio indica cuánto hay que esperar con la cabecera Retry-After, se espera ese tiempo
+        respect_retry_after_header=True,
+        # Al agotar los reintentos se devuelve la última respuesta para que raise_for_status() lance el HTTPError
+        raise_on_status=False,
+    )
+    # Se suma a cada espera un tiempo aleatorio de hasta medio segundo, para que varios procesos que reciben un 429 a la vez
+    # no vuelvan a llamar al servicio todos al mismo tiempo. El atributo backoff_jitter solo existe a partir de urllib3 2.0.
+    if hasattr(retry, "backoff_jitter"):
+        retry.backoff_jitter = 0.5
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip", "Connection": "keep-alive"})
+    return session
+
+
+@cache
+def get_http_session() -> requests.Session:
+    """Devuelve la sesión HTTP compartida por todas las llamadas a las APIs de Power BI, Fabric y Azure.
+    Se crea la primera vez que se necesita."""
+    return create_http_session()
+
+
+def get_json_with_etag(api_url: str, headers: dict, encoding: str | None = None):
+    """Hace una llamada GET con la sesión HTTP compartida y devuelve el cuerpo de la respuesta decodificado como JSON.
+    Si una llamada anterior a la misma URL devolvió la cabecera ETag, se envía en la cabecera If-None-Match,
+    y si el servicio responde 304 porque no ha cambiado, se devuelve la respuesta guardada sin volver a descargarla ni decodificarla.
+    Como la respuesta guardada se puede devolver varias veces, no se debe modificar.
+    """
+    etag_response = etag_responses.get(api_url)
+    if etag_response is not None:
+        headers = {**headers, "If-None-Match": etag_response[0]}
+
+    http_response = get_http_session().get(api_url, headers=headers)
+    if http_response.status_code == 304 and etag_response is not None:
+        return etag_response[1]
+
+    http_response.raise_for_status()
+    if encoding is not None:
+        http_response.encoding = encoding
+    response_json = http_response.json()
+
+    etag = http_response.headers.get("ETag")
+    if etag is not None:
+        etag_responses[api_url] = (etag, response_json)
+
+    return response_json
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import locale
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from pyarrow import json as pajson
+
+# Tamaño en bytes de los bloques en que pyarrow lee los archivos JSON. Cada objeto tiene que caber completo en un bloque.
+JSON_READ_BLOCK_SIZE = 32 << 20
+
+
+def read_json_to_table(json_file: str | Path) -> pa.Table:
+    """Lee un archivo JSON a una tabla de Arrow, sin pasar por pandas.
+    El archivo puede ser JSON Lines, con un objeto en cada línea, una lista de objetos o un solo objeto.
+    El archivo se lee del disco una sola vez y todas las conversiones trabajan con esos bytes en memoria.
+    """
+    json_bytes = Path(json_file).read_bytes()
+
+    table = read_json_lines_to_table(json_bytes)
+    if table is not None:
+        return table
+
+    # Primero se asume que el archivo está codificado en UTF-8 y si no, con la codificación por defecto del Sistema Operativo
+    try:
+        json_text = json_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        json_text = json_bytes.decode(locale.getpreferredencoding(False))
+
+    return json_records_to_table(json.loads(json_text))
+
+
+def read_json_lines_to_table(json_bytes: bytes) -> pa.Table | None:
+    """Convierte el contenido de un archivo JSON Lines, con un objeto JSON en cada línea, directamente a una tabla de Arrow.
+    pyarrow convierte el texto a columnas en C++ y con varios hilos, sin crear objetos de Python ni un DataFrame de pandas.
+    Si el contenido no tiene ese formato, por ejemplo, si es una lista de objetos, devuelve None.
+    """
+    import pyarrow as pa
+    from pyarrow import json as pajson
+
+    # Las listas de objetos no se pueden leer con pyarrow
+    if not json_bytes[:1024].lstrip().startswith(b"{"):
+        return None
+
+    # Las fechas se mantienen como texto, igual que en una lista de objetos,
+    # para que un mismo conjunto de datos tenga el mismo esquema sea cual sea el formato del archivo.
+    try:
+        table = read_json_with_text_dates(
+            json_bytes,
+            pajson.ReadOptions(use_threads=True, block_size=JSON_READ_BLOCK_SIZE),
+        )
+    except pa.ArrowInvalid:
+        # Por ejemplo, un solo objeto JSON que ocupa varias líneas, o un archivo que no está en UTF-8
+        return None
+
+    return normalize_json_table(table)
+
+
+def read_json_with_text_dates(
+    json_buffer: bytes | pa.Buffer,
+    read_options: pajson.ReadOptions,
+    newlines_in_values: bool = False,
+) -> pa.Table:
+    """Lee JSON con el lector de pyarrow manteniendo como texto los valores con fechas.
+    pyarrow convierte en timestamps los textos con fechas, y al volver a convertirlos a texto no siempre quedan igual,
+    por ejemplo, "2020-01-01" se convierte en "2020-01-01 00:00:00".
+    Por eso, si encuentra timestamps, vuelve a leer el JSON indicando que esas columnas son de texto,
+    lo que mantiene los valores exactamente como estaban.
+    """
+    import pyarrow as pa
+    from pyarrow import json as pajson
+
+    table = pajson.read_json(
+        pa.BufferReader(json_buffer),
+        read_options=read_options,
+        parse_options=pajson.ParseOptions(newlines_in_values=newlines_in_values),
+    )
+
+    schema = pa.schema(
+        [field.with_type(timestamps_to_string(field.type)) for field in table.schema]
+    )
+    if schema.equals(table.schema):
+        return table
+
+    return pajson.read_json(
+        pa.BufferReader(json_buffer),
+        read_options=read_options,
+        parse_options=pajson.ParseOptions(
+            explicit_schema=schema, newlines_in_values=newlines_in_values
+        ),
+    )
+
+
+def timestamps_to_string(data_type: pa.DataType) -> pa.DataType:
+    """Devuelve el mismo tipo de Arrow pero cambiando a texto los timestamps, incluidos los de los objetos y las listas anidados."""
+    import pyarrow as pa
+
+    if pa.types.is_timestamp(data_type):
+        return pa.string()
+
+    if pa.types.is_struct(data_type):
+        return pa.struct(
+            [field.with_type(timestamps_to_string(field.type)) for field in data_type]
+        )
+
+    if pa.types.is_list(data_type):
+        return pa.list_(
+            data_type.value_field.with_type(timestamps_to_string(data_type.value_type))
+        )
+
+    return data_type
+
+
+def json_records_to_table(data: list | dict) -> pa.Table:
+    """Convierte una lista de objetos JSON, o un solo objeto, ya cargados en Python, a una tabla de Arrow.
+    Las columnas son todos los campos que aparecen en alguno de los objetos.
+    """
+    import pyarrow as pa
+
+    if isinstance(data, dict):
+        data = [data]
+
+    records = pa.array(data)
+    if not pa.types.is_struct(records.type):
+        raise ValueError("el archivo JSON tiene que contener objetos")
+
+    table = pa.Table.from_batches([pa.RecordBatch.from_struct_array(records)])
+    return normalize_json_table(table)
+
+
+def normalize_json_table(table: pa.Table) -> pa.Table:
+    """Prepara una tabla de Arrow leída de un JSON para guardarla en Delta o en Parquet.
+    Los objetos anidados se separan en una columna por campo, con los nombres unidos por un punto, igual que en pandas.json_normalize.
+    Las columnas que solo tienen valores nulos se convierten a texto, porque el tipo nulo no es compatible con Delta.
+    """
+    import pyarrow as pa
+
+    # flatten() solo separa un nivel de objetos anidados
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+
+    schema = pa.schema(
+        [
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+            for field in table.schema
+        ]
+    )
+    return table.cast(schema)
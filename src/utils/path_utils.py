@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Iterator
+
+
+def find_files(folder: str | Path, pattern: str) -> Iterator[Path]:
+    """Devuelve los archivos de una carpeta cuyo nombre cumple con un patrón, por ejemplo: *.csv.
+    La carpeta se recorre con os.scandir, que devuelve el nombre y el tipo de cada entrada sin consultas adicionales al sistema de archivos.
+    Si el patrón incluye subcarpetas, se utiliza Path.glob.
+    """
+    if "/" in pattern or os.sep in pattern or "**" in pattern:
+        yield from (path for path in Path(folder).glob(pattern) if path.is_file())
+        return
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+                yield Path(entry.path)
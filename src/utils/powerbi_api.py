@@ -1,4 +1,6 @@
-import requests
+import json
+
+from utils.http_session import get_http_session, get_json_with_etag
 
 POWER_BI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
 POWER_BI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
@@ -13,19 +15,12 @@ def get_dataset(access_token, dataset_id):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.get(
-        api_url,
-        headers=headers,
-    )
-
-    http_response.raise_for_status()
-    http_response.encoding = "utf-8-sig"
-    return http_response.json()
+    return get_json_with_etag(api_url, headers, encoding="utf-8-sig")
 
 
 def execute_dax(access_token, dataset_id, dax_query):
     """Ejecuta una consulta DAX con la API de Power BI.
-    Retorna un JSON con la respuesta de la API.
+    Retorna el cuerpo de la respuesta de la API, un JSON sin decodificar, para que se pueda leer directamente con Arrow.
     """
     api_url = f"{POWER_BI_API_BASE}/datasets/{dataset_id}/executeQueries"
 
@@ -34,15 +29,20 @@ def execute_dax(access_token, dataset_id, dax_query):
         "Authorization": "Bearer " + access_token,
     }
 
-    http_response = requests.post(
-        api_url,
-        headers=headers,
-        json={
+    # El cuerpo se serializa directamente a bytes UTF-8, sin escapar los caracteres acentuados como hace el parámetro json de requests
+    body = json.dumps(
+        {
             "queries": [{"query": f"{dax_query}"}],
             "serializerSettings": {"includeNulls": True},
         },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    http_response = get_http_session().post(
+        api_url,
+        headers=headers,
+        data=body,
     )
 
     http_response.raise_for_status()
-    http_response.encoding = "utf-8-sig"
-    return http_response.json()
+    return http_response.content
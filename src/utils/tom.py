@@ -1,7 +1,7 @@
-from enum import Enum
+from enum import IntEnum
 
 
-class DataType(Enum):
+class DataType(IntEnum):
     """Este enum es una copia del enum DataType definido en la librería .NET Microsoft.AnalysisServices.Tabular
     https://learn.microsoft.com/en-us/dotnet/api/microsoft.analysisservices.tabular.datatype?view=analysisservices-dotnet
     """
@@ -18,7 +18,7 @@ class DataType(Enum):
     VARIANT = 20  # A measure with varying data type.
 
 
-class ColumnType(Enum):
+class ColumnType(IntEnum):
     """Este enum es una copia del enum ColumnType definido en la librería .NET Microsoft.AnalysisServices.Tabular
     https://learn.microsoft.com/en-us/dotnet/api/microsoft.analysisservices.tabular.columntype?view=analysisservices-dotnet
     """
@@ -29,7 +29,7 @@ class ColumnType(Enum):
     ROW_NUMBER = 3  # This column is automatically added by the Server to every table.
 
 
-class RelationshipEndCardinality(Enum):
+class RelationshipEndCardinality(IntEnum):
     """Este enum es una copia del enum RelationshipEndCardinality definido en la librería .NET Microsoft.AnalysisServices.Tabular
     https://learn.microsoft.com/en-us/dotnet/api/microsoft.analysisservices.tabular.relationshipendcardinality?view=analysisservices-dotnet
     """
@@ -39,7 +39,7 @@ class RelationshipEndCardinality(Enum):
     ONE = 1  # Specifies the 'one' side of a one-to-one or one-to-many relationship.
 
 
-class CrossFilteringBehavior(Enum):
+class CrossFilteringBehavior(IntEnum):
     """Este enum es una copia del enum CrossFilteringBehavior definido en la librería .NET Microsoft.AnalysisServices.Tabular
     https://learn.microsoft.com/en-us/dotnet/api/microsoft.analysisservices.tabular.crossfilteringbehavior?view=analysisservices-dotnet
     """
@@ -49,7 +49,7 @@ class CrossFilteringBehavior(Enum):
     ONEDIRECTION = 1  # The rows selected in the 'To' end of the relationship will automatically filter scans of the table in the 'From' end of the relationship.
 
 
-class AggregateFunction(Enum):
+class AggregateFunction(IntEnum):
     """Este enum es una copia del enum AggregateFunction definido en la librería .NET Microsoft.AnalysisServices.Tabular
     https://learn.microsoft.com/en-us/dotnet/api/microsoft.analysisservices.tabular.aggregatefunction?view=analysisservices-dotnet
     """